@@ -11,6 +11,11 @@ import urllib.parse
 import base64
 import math
 import os
+import efemerides as efe
+import coeficientes as coef
+import fila_calculo as fila
+import cache_memoria as cm
+import tarefas
 
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Revolução Planetária", layout="wide")
@@ -60,6 +65,13 @@ SIMBOLOS_PLANETAS = {
     "URANO": "♅", "NETUNO": "♆", "PLUTÃO": "♇"
 }
 
+# Símbolo do aspecto (HTML) indexado pelo código de efe.codigo_aspecto (-1 = sem aspecto)
+SIMBOLOS_ASPECTO_HTML = [f"<span style='font-size: 16px; line-height: 0; vertical-align: baseline;'><b>{ASPECTOS[k * 30][1]}</b></span>" for k in range(7)] + [""]
+
+# Limiares de intensidade convertidos em distância ao grau natal
+DIST_PICO = efe.distancia_para_intensidade(0.98)
+DIST_FORTE = efe.distancia_para_intensidade(0.841)
+
 MESES = {1:'Janeiro', 2:'Fevereiro', 3:'Março', 4:'Abril', 5:'Maio', 6:'Junho', 7:'Julho',
          8:'Agosto', 9:'Setembro', 10:'Outubro', 11:'Novembro', 12:'Dezembro'}
 
@@ -124,9 +136,8 @@ def obter_simbolo_aspecto(long1, long2):
             return simbolo
     return ""
 
-def gerar_texto_relatorio(df, planeta_alvo_nome, long_natal_ref):
-    col_p = planeta_alvo_nome.upper()
-    if col_p not in df.columns or long_natal_ref <= 0:
+def gerar_texto_relatorio(eventos_planeta, planeta_alvo_nome, long_natal_ref):
+    if not eventos_planeta or long_natal_ref <= 0:
         return []
 
     # 1. Função que retorna APENAS o símbolo baseado na distância de signos
@@ -151,59 +162,35 @@ def gerar_texto_relatorio(df, planeta_alvo_nome, long_natal_ref):
         except:
             return ""
 
-    LIMIAR_INFLUENCIA = 0.01
-    LIMIAR_FORTE = 0.841
-
-    mask_inf = df[col_p] > LIMIAR_INFLUENCIA
-    df_copy = df.copy()
-    df_copy['group_inf'] = (mask_inf != mask_inf.shift()).cumsum()
-    curvas_grandes = df_copy[mask_inf].groupby('group_inf')
-
     relatorios_planeta = []
     signo_natal = get_signo(long_natal_ref)
 
-    for _, dados_curva in curvas_grandes:
-        if len(dados_curva) < 2: continue
+    # Cada janela de orbe (5°) é um trânsito; entrada, saída e picos já vêm exatos do solucionador
+    for janela in eventos_planeta["transito"]:
+        if janela["saida"] <= janela["entrada"]: continue
         
-        data_ini_total = dados_curva['date'].min().strftime('%d/%m/%Y')
-        data_fim_total = dados_curva['date'].max().strftime('%d/%m/%Y')
+        data_ini_total = efe.jd_para_datetime(janela["entrada"]).strftime('%d/%m/%Y')
+        data_fim_total = efe.jd_para_datetime(janela["saida"]).strftime('%d/%m/%Y')
         
-        ponto_max_total = dados_curva.loc[dados_curva[col_p].idxmax()]
-        signo_transito = get_signo(ponto_max_total[f"{col_p}_long"])
+        signo_transito = get_signo(janela["maximo"]["long"])
         
         # Pega apenas o símbolo
         simbolo = obter_simbolo_por_signo(signo_transito, signo_natal)
         
-        # Identifica blocos de aspecto forte
-        mask_forte = dados_curva[col_p] >= LIMIAR_FORTE
+        # Blocos de aspecto forte contidos neste trânsito
         intervalos_fortes_texto = []
-        
-        if mask_forte.any():
-            grupos_fortes = (mask_forte != mask_forte.shift()).cumsum()
-            ilhas_fortes = dados_curva[mask_forte].groupby(grupos_fortes)
+        for forte in eventos_planeta["forte"]:
+            if not janela["entrada"] <= forte["maximo"]["jd"] <= janela["saida"]: continue
             
-            for _, ilha in ilhas_fortes:
-                f_ini = ilha['date'].min().strftime('%d/%m/%Y')
-                f_fim = ilha['date'].max().strftime('%d/%m/%Y')
-                
-                # Lógica de Picos
-                valores = ilha[col_p].values
-                datas = ilha['date'].values
-                picos = []
-                if len(valores) <= 3:
-                    picos.append(pd.to_datetime(datas[np.argmax(valores)]).strftime('%d/%m/%Y'))
-                else:
-                    for i in range(1, len(valores) - 1):
-                        if valores[i] > valores[i-1] and valores[i] >= valores[i+1]:
-                            picos.append(pd.to_datetime(datas[i]).strftime('%d/%m/%Y'))
-                    if not picos:
-                        picos.append(pd.to_datetime(datas[np.argmax(valores)]).strftime('%d/%m/%Y'))
-
-                str_picos = " e ".join(list(set(picos)))
-                intervalos_fortes_texto.append(
-                    f"**Período de intensidade forte**: entre {f_ini} até {f_fim}  \n"
-                    f"**Pico**: {str_picos}"
-                )
+            f_ini = efe.jd_para_datetime(forte["entrada"]).strftime('%d/%m/%Y')
+            f_fim = efe.jd_para_datetime(forte["saida"]).strftime('%d/%m/%Y')
+            
+            picos = forte["picos"] or [forte["maximo"]]
+            str_picos = " e ".join(efe.jd_para_datetime(pk["jd"]).strftime('%d/%m/%Y %H:%M') for pk in picos)
+            intervalos_fortes_texto.append(
+                f"**Período de intensidade forte**: entre {f_ini} até {f_fim}  \n"
+                f"**Pico**: {str_picos}"
+            )
 
         # Título principal com o símbolo ao lado do signo
         texto = (f"### {planeta_alvo_nome} em {signo_transito} {simbolo}  \n"
@@ -226,7 +213,9 @@ signo_selecionado = st.sidebar.selectbox("Signo do Zodíaco", options=["Escolha
 
 grau_decimal = dms_to_dec(grau_input)
 incluir_lua = st.sidebar.checkbox("Quero analisar a Lua", value=False)
-mes_selecionado = st.sidebar.slider("Mês da Lua", 1, 12, 1) if incluir_lua else None
+# A Lua num único mês (grade fina) ou no ano inteiro (grade do ano, como os demais corpos)
+periodo_lua = st.sidebar.radio("Período da Lua", ["Um mês", "Ano inteiro"], horizontal=True) if incluir_lua else None
+mes_selecionado = st.sidebar.slider("Mês da Lua", 1, 12, 1) if periodo_lua == "Um mês" else None
 
 # Verificação da Regra de Minutos < 60
 if grau_decimal == "ERRO_MINUTOS":
@@ -252,31 +241,7 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # --- PROCESSAMENTO ---
-@st.cache_data
-def get_annual_movements(ano_ref):
-    planetas_cfg = [{"id": i, "nome": n} for i, n in zip([swe.SUN, swe.MERCURY, swe.VENUS, swe.MARS, swe.JUPITER, swe.SATURN, swe.URANUS, swe.NEPTUNE, swe.PLUTO], ["SOL", "MERCÚRIO", "VÊNUS", "MARTE", "JÚPITER", "SATURNO", "URANO", "NETUNO", "PLUTÃO"])]
-    jd_start = swe.julday(ano_ref, 1, 1)
-    jd_end = swe.julday(ano_ref + 1, 1, 1)
-    steps = np.arange(jd_start, jd_end, 0.5)
-    movs = []
-    for p in planetas_cfg:
-        status_atual, data_inicio = None, None
-        for jd in steps:
-            res, _ = swe.calc_ut(jd, p["id"], swe.FLG_SWIEPH | swe.FLG_SPEED)
-            status_ponto = "Retrógrado" if res[3] < 0 else "Direto"
-            if status_atual is None:
-                status_atual = status_ponto
-                y, m, d, _ = swe.revjul(jd)
-                data_inicio = datetime(y, m, d)
-            elif status_ponto != status_atual:
-                y, m, d, _ = swe.revjul(jd)
-                movs.append({"Planeta": p["nome"].capitalize(), "Início": data_inicio.strftime('%d/%m/%Y'), "Término": datetime(y, m, d).strftime('%d/%m/%Y'), "Trânsito": status_atual})
-                status_atual, data_inicio = status_ponto, datetime(y, m, d)
-        movs.append({"Planeta": p["nome"].capitalize(), "Início": data_inicio.strftime('%d/%m/%Y'), "Término": f"31/12/{ano_ref}", "Trânsito": status_atual})
-    return pd.DataFrame(movs)
-
-@st.cache_data
-def get_planetary_data(ano_ref, grau_ref_val, analisar_lua, mes_unico, long_natal_ref):
+def corpos_do_periodo(analisar_lua):
     planetas_cfg = [
         {"id": swe.SUN, "nome": "SOL", "cor": "#FFF12E"}, {"id": swe.MERCURY, "nome": "MERCÚRIO", "cor": "#F3A384"},
         {"id": swe.VENUS, "nome": "VÊNUS", "cor": "#0A8F11"}, {"id": swe.MARS, "nome": "MARTE", "cor": "#F10808"},
@@ -285,35 +250,141 @@ def get_planetary_data(ano_ref, grau_ref_val, analisar_lua, mes_unico, long_nata
         {"id": swe.PLUTO, "nome": "PLUTÃO", "cor": "#14F1F1"}
     ]
     if analisar_lua: planetas_cfg.insert(1, {"id": swe.MOON, "nome": "LUA", "cor": "#A6A6A6"})
-    jd_start = swe.julday(ano_ref, mes_unico if mes_unico else 1, 1)
-    jd_end = swe.julday(ano_ref + (1 if not mes_unico else 0), (mes_unico + 1 if mes_unico and mes_unico < 12 else 1) if mes_unico else 1, 1)
-    steps = np.arange(jd_start, jd_end, 0.005 if analisar_lua and mes_unico else 0.05)
-    all_data = []
-    for jd in steps:
-        y, m, d, h = swe.revjul(jd)
-        dt = datetime(y, m, d, int(h), int((h%1)*60))
-        row = {'date': dt}
-        for p in planetas_cfg:
-            res, _ = swe.calc_ut(jd, p["id"], swe.FLG_SWIEPH | swe.FLG_SPEED)
-            pos = res[0] % 30
-            dist = abs(((pos - grau_ref_val + 15) % 30) - 15)
-            
-            simbolo = obter_simbolo_aspecto(res[0], long_natal_ref) if long_natal_ref > 0 else ""
-            simbolo_html = f"<span style='font-size: 16px; line-height: 0; vertical-align: baseline;'><b>{simbolo}</b></span>" if simbolo else ""
-            
-            row[p["nome"]] = np.exp(-0.5 * (dist / 1.7)**2) if dist <= 5.0 else 0
-            row[f"{p['nome']}_long"] = res[0]
-            row[f"{p['nome']}_status"] = "Retrógrado" if res[3] < 0 else "Direto"
-            row[f"{p['nome']}_info"] = f"{get_signo(res[0])} {'(R)' if res[3]<0 else '(D)'} {int(pos):02d}°{int((pos%1)*60):02d}' - {'Forte' if dist <= 1.0 else 'Médio' if dist <= 2.5 else 'Fraco'} {simbolo_html}"
-        all_data.append(row)
-    return pd.DataFrame(all_data).infer_objects(copy=False), planetas_cfg
+    return planetas_cfg
+
+# Pedidos à fila de cálculo montados num lugar só: a antecipação em segundo plano precisa
+# dos mesmos argumentos para que o pedido de verdade encontre o resultado guardado
+def pedido_movimentos(ano_ref):
+    return tarefas.movimentos_anuais, ano_ref, [{"id": p["id"], "nome": p["nome"]} for p in corpos_do_periodo(False)]
+
+def pedido_eventos(ano_ref, grau_ref_val, analisar_lua, mes_unico):
+    corpos = [{"id": p["id"], "nome": p["nome"]} for p in corpos_do_periodo(analisar_lua)]
+    return tarefas.eventos_corpos, ano_ref, mes_unico, corpos, grau_ref_val, DIST_FORTE
+
+@cm.memoizar(8)
+def get_annual_movements(ano_ref):
+    # Estações e sombras exatas calculadas na fila (as mesmas séries do gráfico, do cache em disco)
+    planetas_cfg = corpos_do_periodo(False)
+    periodos_corpos = fila.executar(*pedido_movimentos(ano_ref))
+    movs = []
+    for p in planetas_cfg:
+        periodos = periodos_corpos[p["nome"]]
+        for i, per in enumerate(periodos):
+            movs.append({
+                "Planeta": p["nome"].capitalize(),
+                "Início": f"01/01/{ano_ref}" if i == 0 else efe.formatar_jd(per["inicio"]),
+                "Término": f"31/12/{ano_ref}" if i == len(periodos) - 1 else efe.formatar_jd(per["fim"]),
+                "Trânsito": "Retrógrado" if per["retrogrado"] else "Direto",
+                "Início da Sombra": efe.formatar_jd(per.get("sombra_ini")),
+                "Fim da Sombra": efe.formatar_jd(per.get("sombra_fim"))
+            })
+    return pd.DataFrame(movs)
 
+@cm.memoizar(64)
+def get_series_mes(ano_ref, mes, ids_corpos):
+    # Um bloco (mês) das séries, calculado na fila; o ano inteiro é a junção dos doze meses
+    return fila.executar(tarefas.series_periodo, ano_ref, mes, ids_corpos)  # mesmos argumentos de antecipar_vizinhos
+
+@cm.memoizar(16)
+def get_series_previa(ano_ref, mes_unico, ids_corpos):
+    # O período inteiro em séries grossas, num trabalho só: a prévia não espera os doze meses
+    return fila.executar(tarefas.series_previa, ano_ref, mes_unico, ids_corpos)
+
+def get_efemerides(ano_ref, analisar_lua, mes_unico, previa=False, progresso=None):
+    # Etapa pesada: posições do período inteiro, independente do grau natal, mês a mês
+    planetas_cfg = corpos_do_periodo(analisar_lua)
+    ids_corpos = [p["id"] for p in planetas_cfg]
+    if previa:
+        series = get_series_previa(ano_ref, mes_unico, ids_corpos)
+    else:
+        # Cada corpo no seu passo nativo (Plutão a cada 5 dias, Lua a cada ~3 horas)
+        meses = [mes_unico] if mes_unico else range(1, 13)
+        partes = efe.processar_em_blocos(lambda mes: get_series_mes(ano_ref, mes, ids_corpos), [(mes,) for mes in meses], progresso=progresso)
+        series = efe.juntar_series(partes, ids_corpos)
+    # Eixo do gráfico, para onde as séries são levadas só na etapa das curvas
+    steps = efe.grade_jd(ano_ref, mes_unico, efe.passo_grafico(mes_unico if analisar_lua else None, previa=previa))
+    return series, {"jd": steps, "date": efe.datas_do_grid(steps)}, planetas_cfg
+
+@cm.memoizar(128)
+def get_planetary_data(ano_ref, grau_ref_val, analisar_lua, mes_unico, long_natal_ref, previa=False):
+    # Etapa leve: só as curvas de intensidade e os rótulos, a partir das efemérides em cache
+    series, eixo, planetas_cfg = get_efemerides(ano_ref, analisar_lua, mes_unico, previa)
+    pos = efe.reamostrar(series, [p["id"] for p in planetas_cfg], eixo["jd"])
+
+    # Só as amostras dentro do orbe, no esquema compacto do motor (efe.ESQUEMA_TRANSITOS)
+    codigos = efe.codigo_aspecto(pos["long"], long_natal_ref) if long_natal_ref > 0 else np.full(pos["long"].shape, -1, dtype=np.int8)
+    tabela = efe.tabela_transitos(efe.intensidade(efe.distancia_no_signo(pos["long"], grau_ref_val)), pos["long"], pos["retro"],
+                                  codigos, [p["nome"] for p in planetas_cfg])
+    return {"date": eixo["date"], "tabela": tabela}, planetas_cfg
+
+@cm.memoizar(32)
+def get_eventos(ano_ref, grau_ref_val, analisar_lua, mes_unico):
+    # Janelas de orbe e de intensidade forte com entrada, saída e picos exatos, por corpo (na fila)
+    return fila.executar(*pedido_eventos(ano_ref, grau_ref_val, analisar_lua, mes_unico))
+
+def antecipar_vizinhos(ano_ref, grau_ref_val, analisar_lua, mes_unico):
+    # Em segundo plano, um trabalho por vez: os meses vizinhos da Lua ou os anos vizinhos,
+    # para que mover o slider ou trocar o ano encontre o cálculo pronto
+    ids_corpos = [p["id"] for p in corpos_do_periodo(analisar_lua)]
+    if analisar_lua and mes_unico:
+        for mes in (mes_unico + 1, mes_unico - 1):
+            if 1 <= mes <= 12:
+                fila.antecipar(tarefas.series_periodo, ano_ref, mes, ids_corpos)
+                fila.antecipar(*pedido_eventos(ano_ref, grau_ref_val, analisar_lua, mes))
+    else:
+        for ano_vizinho in (ano_ref + 1, ano_ref - 1):
+            if 1900 <= ano_vizinho <= 2100:
+                for mes in range(1, 13):
+                    fila.antecipar(tarefas.series_periodo, ano_vizinho, mes, ids_corpos)
+                fila.antecipar(*pedido_movimentos(ano_vizinho))
+                fila.antecipar(*pedido_eventos(ano_vizinho, grau_ref_val, analisar_lua, None))
+
+def montar_grafico(dados_grafico, lista_planetas, eventos_transito=None):
+    # Sem eventos (prévia em grade grossa), só as curvas, sem os marcadores de pico
+    fig = go.Figure()
+    for p in lista_planetas:
+        tabela = dados_grafico["tabela"]
+        trechos = efe.trechos_hover(tabela[tabela["corpo"] == p['nome']], grau_decimal, SIGNOS, SIMBOLOS_ASPECTO_HTML)
+        for n, trecho in enumerate(trechos):
+            fig.add_trace(go.Scatter(x=dados_grafico["date"][trecho["fatia"]], y=trecho["intensidade"], name=p['nome'], legendgroup=p['nome'], showlegend=(n == 0), mode='lines',
+                                     line=dict(color=p['cor'], width=2.5), fill='tozeroy', fillcolor=hex_to_rgba(p['cor'], 0.15),
+                                     customdata=trecho["customdata"], hovertemplate=trecho["hovertemplate"], connectgaps=False))
+
+        picos = [pk for janela in eventos_transito[p['nome']]["transito"] for pk in janela["picos"] if pk["dist"] < DIST_PICO] if eventos_transito else []
+        if picos:
+            datas_picos = [efe.jd_para_datetime(pk["jd"]) for pk in picos]
+            fig.add_trace(go.Scatter(x=datas_picos, y=efe.intensidade([pk["dist"] for pk in picos])+0.04, mode='markers+text', text=[d.strftime('%d/%m') for d in datas_picos],
+                                     textposition="top center", marker=dict(symbol="triangle-down", color=p['cor'], size=8), showlegend=False, hoverinfo='skip'))
+
+    fig.update_layout(title=dict(text=f'<b>{p_texto} Natal a {grau_input}° de {s_texto}</b>', x=0.5, xanchor = 'center', font = dict(size = 28)),
+                      height=700,
+                      xaxis=dict(rangeslider=dict(visible=True, thickness=0.08), type='date', tickformat='%d/%m\n%Y', hoverformat='%d/%m/%Y %H:%M'),
+                      yaxis=dict(title='Intensidade', range=[0, 1.3], fixedrange=True), template='plotly_white', hovermode='x unified', dragmode='pan')
+    return fig
+
+# Barra de progresso entre blocos: cada atualização também é o ponto em que o Streamlit
+# interrompe uma execução obsoleta (ano ou mês trocado no meio do cálculo)
+barra_progresso = st.progress(0.0, text="Montando a prévia...")
+# Primeira pintura: o mesmo cálculo sobre séries grossas (um único trabalho) numa grade grossa
+# (1 dia no ano, ~365 pontos), antes das séries finas mês a mês; o gráfico fino a substitui
+# no mesmo lugar assim que fica pronto
+area_grafico = st.empty()
+dados_previa, lista_planetas = get_planetary_data(ano, grau_decimal, incluir_lua, mes_selecionado, long_natal_absoluta_calc, previa=True)
+# Chave própria: sem eventos no período, a prévia e o gráfico fino saem iguais (mesmo ID automático)
+area_grafico.plotly_chart(montar_grafico(dados_previa, lista_planetas), use_container_width=True, config={'scrollZoom': True}, key="previa")
+series_periodo = get_efemerides(ano, incluir_lua, mes_selecionado, progresso=lambda f: barra_progresso.progress(0.6 * f, text="Sincronizando efemérides..."))[0]
+barra_progresso.progress(0.6, text="Calculando estações e sombras...")
 df_mov_anual = get_annual_movements(ano)
-df, lista_planetas = get_planetary_data(ano, grau_decimal, incluir_lua, mes_selecionado, long_natal_absoluta_calc)
+barra_progresso.progress(0.75, text="Montando as curvas de intensidade...")
+dados_grafico, lista_planetas = get_planetary_data(ano, grau_decimal, incluir_lua, mes_selecionado, long_natal_absoluta_calc)
+barra_progresso.progress(0.85, text="Calculando as janelas de trânsito...")
+eventos_transito = get_eventos(ano, grau_decimal, incluir_lua, mes_selecionado)
+barra_progresso.empty()
+antecipar_vizinhos(ano, grau_decimal, incluir_lua, mes_selecionado)
 grau_limpo_file = str(grau_input).replace('.', '_')
 
 if incluir_lua:
-    mes_nome = MESES.get(mes_selecionado, "periodo").lower()
+    mes_nome = MESES[mes_selecionado].lower() if mes_selecionado else "lua_ano_inteiro"
     file_name_grafico = f"revolucao_planetaria_{mes_nome}_{ano}_{planeta_selecionado}_em_{signo_selecionado}_grau_{grau_limpo_file}.html"
     file_name_tabela = f"aspectos_{mes_nome}_{ano}_{planeta_selecionado}_em_{signo_selecionado}_grau_{grau_limpo_file}.xlsx"
 else:
@@ -321,7 +392,7 @@ else:
     file_name_tabela = f"aspectos_{ano}_{planeta_selecionado}_em_{signo_selecionado}_grau_{grau_limpo_file}.xlsx"
 
 @st.fragment
-def fragmento_relatorio_lentos (df, planeta_selecionado, grau_input, signo_selecionado):
+def fragmento_relatorio_lentos (eventos_transito, planeta_selecionado, grau_input, signo_selecionado):
     st.markdown("<h2 style='text-align: center;'>📋 Relatório de Trânsitos</h2>", unsafe_allow_html=True)
     if st.button("Gerar Relatório de Trânsitos", use_container_width=True):
         if planeta_selecionado == "Escolha um planeta" or signo_selecionado == "Escolha um signo":
@@ -335,7 +406,7 @@ def fragmento_relatorio_lentos (df, planeta_selecionado, grau_input, signo_selec
                 # st.write("")
 
                 for p_lento in lentos:
-                    lista_periodos = gerar_texto_relatorio(df, p_lento, long_natal_absoluta_calc)
+                    lista_periodos = gerar_texto_relatorio(eventos_transito.get(p_lento.upper()), p_lento, long_natal_absoluta_calc)
                     if lista_periodos:
                         encontrou_algum = True
                         for periodo_texto in lista_periodos:
@@ -398,9 +469,10 @@ def secao_previsao_ia(ano, planeta_selecionado, signo_selecionado, grau_input, l
                 {"id": swe.NEPTUNE, "nome": "Netuno"}, {"id": swe.PLUTO, "nome": "Plutão"}
             ]
 
-            for p in planetas_ia:
-                res, _ = swe.calc_ut(jd_ia, p["id"], swe.FLG_SWIEPH | swe.FLG_SPEED)
-                long_transito = res[0]
+            # Todos os corpos de uma vez (coeficientes de Chebyshev, ou swisseph como reserva)
+            pos_ia = coef.calcular_posicoes([jd_ia], [p["id"] for p in planetas_ia])
+            for j, p in enumerate(planetas_ia):
+                long_transito = pos_ia["long"][0, j]
                 pos_no_signo = long_transito % 30
                 
                 diff = abs(long_transito - long_natal_absoluta_calc) % 360
@@ -417,7 +489,7 @@ def secao_previsao_ia(ano, planeta_selecionado, signo_selecionado, grau_input, l
                         break
                 
                 if aspecto_nome != "Nenhum":
-                    status = "Retrógrado" if res[3] < 0 else "Direto"
+                    status = "Retrógrado" if pos_ia["retro"][0, j] else "Direto"
                     forca = "Forte" if menor_orbe <= 1.0 else "Médio" if menor_orbe <= 2.5 else "Fraco"
                     ativos_ia.append(f"{p['nome']} em {get_signo(long_transito)} ({status}) {int(pos_no_signo):02d}°{int((pos_no_signo%1)*60):02d}' fazendo {aspecto_nome} - {forca}")
 
@@ -431,25 +503,11 @@ def secao_previsao_ia(ano, planeta_selecionado, signo_selecionado, grau_input, l
                     st.info("Não há aspectos significativos para este momento.")
 
 # --- GRÁFICO ---
-fig = go.Figure()
-for p in lista_planetas:
-    df_p = df.copy()
-    df_p.loc[df_p[p['nome']] == 0, p['nome']] = None
-    fig.add_trace(go.Scatter(x=df_p['date'], y=df_p[p['nome']], name=p['nome'], mode='lines', line=dict(color=p['cor'], width=2.5),
-                             fill='tozeroy', fillcolor=hex_to_rgba(p['cor'], 0.15), customdata=df[f"{p['nome']}_info"],
-                             hovertemplate="<b>%{customdata}</b><extra></extra>", connectgaps=False))
-    
-    serie = df[p['nome']].fillna(0)
-    picos = df[(serie > 0.98) & (serie > serie.shift(1)) & (serie > serie.shift(-1))]
-    if not picos.empty:
-        fig.add_trace(go.Scatter(x=picos['date'], y=picos[p['nome']]+0.04, mode='markers+text', text=picos['date'].dt.strftime('%d/%m'),
-                                 textposition="top center", marker=dict(symbol="triangle-down", color=p['cor'], size=8), showlegend=False, hoverinfo='skip'))
-
-fig.update_layout(title=dict(text=f'<b>{p_texto} Natal a {grau_input}° de {s_texto}</b>', x=0.5, xanchor = 'center', font = dict(size = 28)),
-                  height=700,
-                  xaxis=dict(rangeslider=dict(visible=True, thickness=0.08), type='date', tickformat='%d/%m\n%Y', hoverformat='%d/%m/%Y %H:%M'),
-                  yaxis=dict(title='Intensidade', range=[0, 1.3], fixedrange=True), template='plotly_white', hovermode='x unified', dragmode='pan')
-st.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True})
+fig = montar_grafico(dados_grafico, lista_planetas, eventos_transito)
+area_grafico.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True})
+erro_hermite = max(serie["erro"] for serie in series_periodo.values()) * 3600
+st.caption(f"Posições interpoladas (Hermite) a partir do passo nativo de cada corpo. Erro máximo (conferido com o swisseph): {erro_hermite:.2f}″ · "
+           f"Tabela de trânsitos: {len(dados_grafico['tabela'])} linhas, {efe.bytes_por_linha(dados_grafico['tabela']):.0f} bytes/linha")
 
 # --- SEÇÃO DE RELATÓRIO (LENTOS) ---
 
@@ -457,7 +515,7 @@ st.divider()
 col_rel1, col_rel2, col_rel3 = st.columns([1, 2, 1])
 
 with col_rel2:
-    fragmento_relatorio_lentos(df, planeta_selecionado, grau_input, signo_selecionado)
+    fragmento_relatorio_lentos(eventos_transito, planeta_selecionado, grau_input, signo_selecionado)
 
 # Chamada da função da seção de IA
 secao_previsao_ia(ano, planeta_selecionado, signo_selecionado, grau_input, long_natal_absoluta_calc)
@@ -539,4 +597,7 @@ st.sidebar.download_button("📥 Baixar Gráfico Interativo (HTML)", data=buf.ge
 
 out_m = io.BytesIO()
 with pd.ExcelWriter(out_m, engine='openpyxl') as w: df_mov_anual.to_excel(w, index=False)
-st.sidebar.download_button("🔄 Baixar Movimento Anual (Excel)", out_m.getvalue(), f"movimento_planetas_{ano}.xlsx")
\ No newline at end of file
+st.sidebar.download_button("🔄 Baixar Movimento Anual (Excel)", out_m.getvalue(), f"movimento_planetas_{ano}.xlsx")
+
+# Contadores do cache em memória (acertos, faltas, descartes) para o Prometheus, se CACHE_METRICAS estiver definido
+cm.exportar_metricas()
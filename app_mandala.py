@@ -7,7 +7,9 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import math
 from datetime import datetime, timedelta, timezone, date
-import geonamescache
+import coeficientes as coef
+import cidades
+import cache_memoria as cm
 
 if 'data_ref' not in st.session_state:
     agora_ut = datetime.now()
@@ -33,40 +35,6 @@ def on_button_click(delta_type, value):
     st.session_state.data_widget = nova_data.date()
     st.session_state.hora_widget = nova_data.time()
 
-# @st.cache_resource
-# def carregar_geo_db():
-#     gc = geonamescache.GeonamesCache()
-#     return gc.get_cities()
-
-@st.cache_resource
-def obter_lista_cidades():
-    gc = geonamescache.GeonamesCache()
-    cidades = gc.get_cities()
-    # Criamos uma lista formatada: "Nome da Cidade, BR"
-    lista_formatada = [
-        f"{c['name']}, {c['countrycode']}" 
-        for c in cidades.values()
-    ]
-    return sorted(lista_formatada), cidades
-
-lista_nomes, dicionario_cidades = obter_lista_cidades()
-
-def buscar_coordenadas_offline(nome_cidade):
-    # 1. Limpeza do nome
-    nome_cidade = nome_cidade.split(',')[0].strip().title()
-    
-    # 2. Busca na base local
-    cidades = obter_lista_cidades()
-    
-    # Procura cidades que contenham o nome digitado
-    # Prioriza cidades com maior população para evitar homônimos pequenos
-    resultados = [c for c in cidades.values() if c['name'] == nome_cidade]
-    
-    if resultados:
-        # Ordena por população e pega a maior
-        cidade_fina = sorted(resultados, key=lambda x: x['population'], reverse=True)[0]
-        return cidade_fina['latitude'], cidade_fina['longitude'], f"{cidade_fina['name']}, {cidade_fina['countrycode']}"
-    
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Mandala Astrológica Interativa", layout="wide")
 st.markdown("""
@@ -134,6 +102,21 @@ SIMBOLOS_PLANETAS = {
     "NETUNO": "♆", "PLUTÃO": "♇"
 }
 
+# Orbe (graus) dos aspectos desenhados
+ORBE_ASPECTO = 5
+
+# Distância mínima (graus) entre os rótulos dos planetas; legível no celular
+DIST_MIN_ROTULOS = 9
+# As longitudes são arredondadas a este passo (graus) antes do arranjo dos rótulos, que é memoizado
+QUANTIZACAO_ROTULOS = 0.05
+
+# Janelas da animação: (meia largura, passo); o número de quadros fica entre ~580 e ~730
+JANELAS_ANIMACAO = {
+    "±24 horas (passo de 5 min)": (timedelta(hours=24), timedelta(minutes=5)),
+    "±30 dias (passo de 2 h)": (timedelta(days=30), timedelta(hours=2)),
+    "±1 ano (passo de 1 dia)": (timedelta(days=365), timedelta(days=1)),
+}
+
 # --- INTERFACE STREAMLIT ---
 st.sidebar.title("🪐 Configurações")
 
@@ -166,34 +149,32 @@ col_a.button("+1 Mês ➡️", on_click=on_button_click, args=['months', 1])
 col_r.button("⬅️ -1 Ano", on_click=on_button_click, args=['years', -1])
 col_a.button("+1 Ano ➡️", on_click=on_button_click, args=['years', 1])
 
+# Animação: uma janela de tempo inteira vai para o navegador e o slider percorre os quadros
+modo_animacao = st.sidebar.checkbox("Animar no navegador", value=False, help="Calcula de uma vez uma janela ao redor da data e percorre o tempo pelo slider, sem recarregar a página.")
+janela_animacao = st.sidebar.selectbox("Janela da animação", list(JANELAS_ANIMACAO)) if modo_animacao else None
+
 #
 incluir_ascendente = st.sidebar.checkbox("Quero incluir o Ascendente", value=False)
 asc_valor = None
+local_asc = None
 if incluir_ascendente:
-    # Em vez de text_input, usamos selectbox para o autocompletar
+    # Autocompletar pelo índice de prefixo da tabela de cidades (carregada só aqui, na primeira vez)
+    prefixo_cidade = st.sidebar.text_input("Digite o início do nome da cidade:", value="São Paulo")
+    opcoes_cidades = cidades.sugestoes(prefixo_cidade)
     escolha_cidade = st.sidebar.selectbox(
-        "Digite ou selecione a cidade:",
-        options=lista_nomes,
-        index=lista_nomes.index("São Paulo, BR") if "São Paulo, BR" in lista_nomes else 0,
-        help="Comece a digitar o nome da sua cidade."
-    )
-
-    # 2. Extrair coordenadas da escolha
-    # Pegamos o nome antes da vírgula
-    nome_puro = escolha_cidade.split(',')[0]
-    cod_pais = escolha_cidade.split(',')[1].strip()
+        "Selecione a cidade:",
+        options=opcoes_cidades,
+        index=0,
+        help="Cidades que começam com o texto digitado, das mais populosas às menores."
+    ) if opcoes_cidades else None
+
+    # 2. Extrair coordenadas da escolha (índice por nome e país)
+    cidade_fina = cidades.buscar_rotulo(escolha_cidade) if escolha_cidade else None
     
-    # Busca rápida no dicionário para pegar Lat/Lon
-    dados_cidade = [
-        c for c in dicionario_cidades.values() 
-        if c['name'] == nome_puro and c['countrycode'] == cod_pais
-    ]
-    
-    if dados_cidade:
-        cidade_fina = dados_cidade[0]
+    if cidade_fina:
         lat = cidade_fina['latitude']
         lon = cidade_fina['longitude']
-        endereco = f"{cidade_fina['name']}, {cidade_fina['countrycode']}"
+        endereco = f"{cidade_fina['nome']}, {cidade_fina['pais']}"
 
         # 3. Cálculo do Ascendente (sempre atualiza com os botões de tempo)
         jd_ut = swe.julday(
@@ -204,48 +185,163 @@ if incluir_ascendente:
         
         cuspides, ascmc = swe.houses(jd_ut, lat, lon, b'P')
         asc_valor = ascmc[0]
+        local_asc = (lat, lon)
         
         st.sidebar.success(f"📍Cidade Encontrada.")
+    else:
+        st.sidebar.warning("Nenhuma cidade começa com esse nome.")
 
 # Atualização do estado com base no que foi digitado
 st.session_state.data_ref = datetime.combine(d_input, t_input)
 
 # --- FUNÇÕES AUXILIARES ---
-def obter_simbolo_aspecto(long1, long2):
-    diff = abs(long1 - long2) % 360
-    if diff > 180: diff = 360 - diff
-    for angulo, (nome, simbolo) in ASPECTOS.items():
-        if abs(diff - angulo) <= 5:  # Orbe de tolerância
-            return simbolo
-    return ""
+def matriz_aspectos(longs_a, longs_b=None):
+    """Pares em aspecto, de uma vez: (índices em a, índices em b, índice em ASPECTOS, separação).
+
+    Sem longs_b, os pares são os de a entre si (i < j); com longs_b (ex.: um anel natal), todos os a x b.
+    """
+    longs_a = np.asarray(longs_a, dtype=float)
+    longs_b = longs_a if longs_b is None else np.asarray(longs_b, dtype=float)
+    # Separação angular (0-180°) de todos os pares numa única operação
+    diff = np.abs(longs_a[:, None] - longs_b[None, :]) % 360
+    separacao = np.minimum(diff, 360 - diff)
+    if longs_b is longs_a:
+        ii, jj = np.triu_indices(len(longs_a), 1)
+    else:
+        ii, jj = np.indices(separacao.shape).reshape(2, -1)
+    separacao = separacao[ii, jj]
+    # Orbe de tolerância; os aspectos distam 60° ou mais entre si, então no máximo um casa com cada par
+    casa = np.abs(separacao[:, None] - np.array(list(ASPECTOS))[None, :]) <= ORBE_ASPECTO
+    em_aspecto = casa.any(axis=1)
+    return ii[em_aspecto], jj[em_aspecto], casa[em_aspecto].argmax(axis=1), separacao[em_aspecto]
 
-def criar_mandala_astrologica(dt):
-    # Cálculo do Julian Day (Apenas argumentos posicionais para evitar TypeError)
-    ano, mes, dia = dt.year, dt.month, dt.day
-    hora_decimal = dt.hour + (dt.minute / 60.0) + (dt.second / 3600.0)
-    jd = swe.julday(ano, mes, dia, hora_decimal)
-    
-    planetas_cfg = [
-        {"id": swe.SUN, "nome": "Sol", "cor": "#FFD700", "sym": "☉"},
-        {"id": swe.MOON, "nome": "Lua", "cor": "#A6A6A6", "sym": "☽"},
-        {"id": swe.MERCURY, "nome": "Mercúrio", "cor": "#F3A384", "sym": "☿"},
-        {"id": swe.VENUS, "nome": "Vênus", "cor": "#0A8F11", "sym": "♀"},
-        {"id": swe.MARS, "nome": "Marte", "cor": "#F10808", "sym": "♂"},
-        {"id": swe.JUPITER, "nome": "Júpiter", "cor": "#1746C9", "sym": "♃"},
-        {"id": swe.SATURN, "nome": "Saturno", "cor": "#381094", "sym": "♄"},
-        {"id": swe.URANUS, "nome": "Urano", "cor": "#FF00FF", "sym": "♅"},
-        {"id": swe.NEPTUNE, "nome": "Netuno", "cor": "#1EFF00", "sym": "♆"},
-        {"id": swe.PLUTO, "nome": "Plutão", "cor": "#14F1F1", "sym": "♇"}
-    ]
+RAIO_INTERNO = 3.5
 
+@st.cache_resource
+def camada_estatica():
+    # Roda fixa (disco interno, régua, anel dos signos e círculo externo) montada uma única vez,
+    # em poucos traces com vários segmentos separados por None, já com o layout final
     fig = go.Figure()
-    raio_interno = 3.5
-    
+    fig.add_trace(go.Scatterpolar(r=[RAIO_INTERNO] * 361, theta=list(range(361)), fill='toself',
+        fillcolor="rgba(245, 245, 245, 0.2)", line=dict(color="black", width=1.5), showlegend=False, hoverinfo='skip'))
+
+    # RÉGUA: um traço por grau, maior para 0, 10, 20 (decanatos), todos num único trace
+    r_regua, theta_regua = [], []
+    for g in range(360):
+        r_regua += [8.0, 8.6 if g % 10 == 0 else 8.3, None]
+        theta_regua += [g, g, None]
+    fig.add_trace(go.Scatterpolar(r=r_regua, theta=theta_regua, mode='lines', line=dict(color="black", width=1),
+                                  connectgaps=False, showlegend=False, hoverinfo='skip'))
+
+    # Anel e símbolos dos signos
+    centros = [i * 30 + 15 for i in range(12)]
+    fig.add_trace(go.Barpolar(r=[2] * 12, theta=centros, width=[30] * 12, base=8,
+                              marker_color="white", marker_line_color="black", marker_line_width=1, showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatterpolar(
+        r=[9.0] * 12, theta=centros, mode='text', text=SIMBOLOS_SIGNOS_UNICODE,
+        textfont=dict(size=50, color=[CORES_SIGNOS.get(simbolo, "black") for simbolo in SIMBOLOS_SIGNOS_UNICODE], family="DejaVu Sans"),
+        showlegend=False, hoverinfo='none'))
+
+    fig.add_trace(go.Scatterpolar(r=[10] * 361, theta=list(range(361)), mode='lines',
+                                  line=dict(color="black", width=2), showlegend=False, hoverinfo='skip'))
+
+    # --- LAYOUT FINAL ---
+    fig.update_layout(
+            width=850, height=850, autosize=False, uirevision="constant",
+            polar=dict(
+                radialaxis=dict(visible=False, range=[0, 10]),
+                angularaxis=dict(
+                    direction="counterclockwise", 
+                    rotation=180, # Áries à esquerda
+                    showgrid=False, 
+                    gridcolor="rgba(0,0,0,0.1)",
+                    showticklabels=False
+            )
+        ),
+        hoverlabel=dict(bgcolor="black", font_size=14, font_family="Arial"),
+        showlegend=False,
+        margin=dict(t=30, b=30, l=30, r=30, pad=0),
+        paper_bgcolor="#0e1117",
+        dragmode=False
+    )
+    return fig
+
+PLANETAS_MANDALA = [
+    {"id": swe.SUN, "nome": "Sol", "cor": "#FFD700", "sym": "☉"},
+    {"id": swe.MOON, "nome": "Lua", "cor": "#A6A6A6", "sym": "☽"},
+    {"id": swe.MERCURY, "nome": "Mercúrio", "cor": "#F3A384", "sym": "☿"},
+    {"id": swe.VENUS, "nome": "Vênus", "cor": "#0A8F11", "sym": "♀"},
+    {"id": swe.MARS, "nome": "Marte", "cor": "#F10808", "sym": "♂"},
+    {"id": swe.JUPITER, "nome": "Júpiter", "cor": "#1746C9", "sym": "♃"},
+    {"id": swe.SATURN, "nome": "Saturno", "cor": "#381094", "sym": "♄"},
+    {"id": swe.URANUS, "nome": "Urano", "cor": "#FF00FF", "sym": "♅"},
+    {"id": swe.NEPTUNE, "nome": "Netuno", "cor": "#1EFF00", "sym": "♆"},
+    {"id": swe.PLUTO, "nome": "Plutão", "cor": "#14F1F1", "sym": "♇"}
+]
+CORES_ASPECTOS = {"☌": "green", "☍": "red", "□": "red", "△": "blue", "✶": "blue", "⚼": "orange", "∠": "orange"}
+
+def _limites_grupo(grupo, dist):
+    # Grupo de rótulos encostados, centrado na média das longitudes reais dos membros
+    meia = (len(grupo["membros"]) - 1) * dist / 2
+    centro = grupo["soma"] / len(grupo["membros"])
+    return centro - meia, centro + meia
+
+def _juntar_grupos(g1, g2):
+    return {"membros": g1["membros"] + g2["membros"], "soma": g1["soma"] + g2["soma"]}
+
+@cm.memoizar(1)
+def _arranjo_rotulos(longs_quantizadas, dist_min):
+    # Longitude visual de cada rótulo, na ordem recebida
+    n = len(longs_quantizadas)
+    longs = [k * QUANTIZACAO_ROTULOS % 360 for k in longs_quantizadas]
+    dist = min(dist_min, 360 / n)
+    ordem = sorted(range(n), key=lambda i: (longs[i], i))
+
+    # A varredura começa logo depois do maior vão do círculo, para virar uma reta crescente
+    vaos = [(longs[ordem[(k + 1) % n]] - longs[ordem[k]]) % 360 for k in range(n)]
+    inicio = (max(range(n), key=lambda k: (vaos[k], -k)) + 1) % n
+    ordem = ordem[inicio:] + ordem[:inicio]
+    grupos = []
+    for volta, i in enumerate(ordem):
+        valor = longs[i] + (360 if volta >= n - inicio else 0)
+        novo = {"membros": [(valor, i)], "soma": valor}
+        # Encostou no grupo anterior: os dois viram um só, recentrado na média
+        while grupos and _limites_grupo(grupos[-1], dist)[1] + dist > _limites_grupo(novo, dist)[0]:
+            novo = _juntar_grupos(grupos.pop(), novo)
+        grupos.append(novo)
+
+    # Fechamento do círculo: o último grupo pode ter crescido até encostar no primeiro
+    while len(grupos) > 1 and _limites_grupo(grupos[-1], dist)[1] + dist > _limites_grupo(grupos[0], dist)[0] + 360:
+        primeiro = grupos.pop(0)
+        novo = {"membros": [(v + 360, i) for v, i in primeiro["membros"]], "soma": primeiro["soma"] + 360 * len(primeiro["membros"])}
+        while grupos and _limites_grupo(grupos[-1], dist)[1] + dist > _limites_grupo(novo, dist)[0]:
+            novo = _juntar_grupos(grupos.pop(), novo)
+        grupos.append(novo)
+
+    visuais = [0.0] * n
+    for grupo in grupos:
+        ini, _ = _limites_grupo(grupo, dist)
+        for k, (_, i) in enumerate(grupo["membros"]):
+            visuais[i] = (ini + k * dist) % 360
+    return tuple(visuais)
+
+def distribuir_rotulos(longs, dist_min=DIST_MIN_ROTULOS):
+    """Longitudes visuais dos rótulos: pelo menos dist_min entre vizinhos, sem trocar a ordem real.
+
+    Uma varredura ordenada pelo círculo (O(n log n)) junta os rótulos próximos em grupos e
+    espalha cada grupo ao redor da média das suas longitudes. Vale para qualquer conjunto de
+    pontos (planetas, Ascendente, MC, nodos...); um segundo anel é outra chamada.
+    """
+    if len(longs) < 2:
+        return [l % 360 for l in longs]
+    return list(_arranjo_rotulos(tuple(int(round(l / QUANTIZACAO_ROTULOS)) for l in longs), dist_min))
+
+def montar_posicoes(longs, asc=None):
+    # Rótulos de cada corpo (e do Ascendente, se houver) com a posição visual já afastada dos vizinhos,
+    # na ordem de PLANETAS_MANDALA (o Ascendente por último), qualquer que seja a data
     # --- POSIÇÕES ---
     posicoes = []
-    for p in planetas_cfg:
-        res, _ = swe.calc_ut(jd, p["id"], swe.FLG_SWIEPH)
-        long_abs = res[0]
+    for p, long_abs in zip(PLANETAS_MANDALA, longs):
         id_signo = int(long_abs / 30)
         grau_no_signo = long_abs % 30
         min_f, gr_i = math.modf(grau_no_signo)
@@ -257,183 +353,152 @@ def criar_mandala_astrologica(dt):
             "signo": SIGNOS[id_signo % 12], "long_visual": long_abs 
         })
 
-    if asc_valor is not None:
-        id_signo_asc = int(asc_valor / 30)
-        grau_no_signo_asc = asc_valor % 30
+    if asc is not None:
+        id_signo_asc = int(asc / 30)
+        grau_no_signo_asc = asc % 30
         min_f_asc, gr_i_asc = math.modf(grau_no_signo_asc)
         
         posicoes.append({
             "nome": "Ascendente", 
-            "long": asc_valor, 
+            "long": asc, 
             "cor": "black", # Ou a cor que preferir
             "sym": "Asc", 
             "grau_int": int(gr_i_asc), 
             "min_int": int(round(min_f_asc * 60)),
             "signo": SIGNOS[id_signo_asc % 12], 
-            "long_visual": asc_valor,
+            "long_visual": asc,
             "is_asc": True # Marcador para identificarmos depois
         })
 
     # Lógica anti-sobreposição (ajuste visual dos símbolos)
-# 1. Definimos a ordem real uma única vez antes do loop
-    posicoes.sort(key=lambda x: x['long'])
-    for i, p in enumerate(posicoes):
-        p['long_visual'] = p['long']
-        p['id_ordem'] = i # Identificador único de posição na fila
-
-    dist_min = 9 # Aumentei para 10 para garantir legibilidade no celular
-    
-    for _ in range(20): # Mais iterações para estabilizar o bloco
-        # Ordenamos visualmente para o loop de vizinhança
-        posicoes.sort(key=lambda x: x['long_visual'])
-        
-        for i in range(len(posicoes)):
-            for j in range(len(posicoes)):
-                if i == j: continue
-                
-                p1 = posicoes[i]
-                p2 = posicoes[j]
-                
-                # Cálculo da distância curta (mesmo do seu original)
-                diff = (p2['long_visual'] - p1['long_visual'] + 180) % 360 - 180
-                
-                if abs(diff) < dist_min:
-                    # --- A CORREÇÃO DA LÓGICA ---
-                    # Checamos a distância astronômica real para saber quem deve estar na frente
-                    diff_real = (p2['long'] - p1['long'] + 180) % 360 - 180
-                    
-                    # Se a repulsão visual (diff) está tentando colocar os planetas 
-                    # em ordem oposta à real (diff_real), nós forçamos a direção correta.
-                    direcao = 1 if diff_real >= 0 else -1
-                    
-                    # A força agora sempre atua para manter o dist_min na direção da ordem real
-                    forca = (dist_min - abs(diff)) / 2
-                    
-                    p2['long_visual'] = (p2['long_visual'] + forca * direcao) % 360
-                    p1['long_visual'] = (p1['long_visual'] - forca * direcao) % 360
-
-    fig.add_trace(go.Scatterpolar(r=[raio_interno] * 361, theta=list(range(361)), fill='toself', 
-        fillcolor="rgba(245, 245, 245, 0.2)", line=dict(color="black", width=1.5), showlegend=False, hoverinfo='skip'))
+    for p, long_visual in zip(posicoes, distribuir_rotulos([p["long"] for p in posicoes])):
+        p["long_visual"] = long_visual
+    return posicoes
 
+def partes_aspectos(posicoes):
     # --- 4. LINHAS DE ASPECTO COM SÍMBOLOS ---
-    CORES_ASPECTOS = {"☌": "green", "☍": "red", "□": "red", "△": "blue", "✶": "blue", "⚼": "orange", "∠": "orange"}
-    for i in range(len(posicoes)):
-        for j in range(i + 1, len(posicoes)):
-            p1, p2 = posicoes[i], posicoes[j]
-            simbolo_asp = obter_simbolo_aspecto(p1['long'], p2['long'])
-            
-            if simbolo_asp:
-                cor_asp = CORES_ASPECTOS.get(simbolo_asp, "gray")
-                fig.add_trace(go.Scatterpolar(r=[raio_interno, raio_interno], theta=[p1['long'], p2['long']],
-                    mode='lines', line=dict(color=cor_asp, width=1.3), opacity=0.3, showlegend=False, hoverinfo='skip'))
-                
-                a1, a2 = np.radians(p1['long']), np.radians(p2['long'])
-                x = (np.cos(a1) + np.cos(a2)) / 2
-                y = (np.sin(a1) + np.sin(a2)) / 2
-                mid_theta = np.degrees(np.arctan2(y, x))
-                dist_ang = abs(p1['long'] - p2['long'])
-                if dist_ang > 180: dist_ang = 360 - dist_ang
-                mid_r = raio_interno * np.cos(np.radians(dist_ang / 2))
-                
-                fig.add_trace(go.Scatterpolar(
-                    r=[mid_r], theta=[mid_theta],
-                    mode='text', text=[simbolo_asp],
-                    textfont=dict(size=16, color=cor_asp, family="Arial Black"),
-                    showlegend=False, hoverinfo='skip'
-                ))
-
-    # --- 2. ANEL DOS SIGNOS E RÉGUA ---
-    for i in range(12):        
-        # RÉGUA: Adiciona 30 pontos por signo
-        graus_signo = list(range(i * 30, (i + 1) * 30))
-        # Criamos traços curtos para cada grau
-        for g in graus_signo:
-            # Traço maior para 0, 10, 20 (decanatos), menor para os outros
-            tamanho_regua = 8.6 if g % 10 == 0 else 8.3
-            fig.add_trace(go.Scatterpolar(
-                r=[8.0, tamanho_regua], theta=[g, g],
-                mode='lines', line=dict(color="black", width=1),
-                showlegend=False, hoverinfo='skip'))
-    
-    for i, signo in enumerate(SIGNOS):
-        centro_polar = i * 30 + 15
-        simbolo = SIMBOLOS_SIGNOS_UNICODE[i]
-        cor_do_signo = CORES_SIGNOS.get(simbolo, "black")
-
-        fig.add_trace(go.Barpolar(r=[2], theta=[centro_polar], width=[30], base=8, 
-                                  marker_color="white", marker_line_color="black", marker_line_width=1, showlegend=False, hoverinfo='skip'))
-
-        # Símbolos dos signos
-        fig.add_trace(go.Scatterpolar(
-            r=[9.0], theta=[i * 30 + 15], mode='text', text=[simbolo],
-            textfont=dict(size=50, color=cor_do_signo, family="DejaVu Sans"), showlegend=False, hoverinfo='none'))
+    # Número fixo de traces (uma linha com segmentos separados por None por cor, mais um de
+    # símbolos), qualquer que seja o número de pontos na roda, para que cada quadro da animação
+    # substitua sempre os mesmos traces
+    longs = np.array([p["long"] for p in posicoes])
+    ii, jj, kk, separacao = matriz_aspectos(longs)
+    simbolos_asp = np.array([simbolo for _, simbolo in ASPECTOS.values()])[kk]
+    cores_asp = np.array([CORES_ASPECTOS.get(simbolo, "gray") for simbolo in simbolos_asp], dtype=object)
+
+    # Símbolo no meio da corda de cada aspecto
+    a1, a2 = np.radians(longs[ii]), np.radians(longs[jj])
+    mid_theta = np.degrees(np.arctan2(np.sin(a1) + np.sin(a2), np.cos(a1) + np.cos(a2)))
+    mid_r = RAIO_INTERNO * np.cos(np.radians(separacao / 2))
+
+    partes = []
+    for cor in dict.fromkeys(CORES_ASPECTOS.values()):
+        do_tipo = cores_asp == cor
+        # Segmentos [l1, l2, None] em sequência: uma única linha (sem ligar os vãos) por cor
+        segmentos = np.full((int(do_tipo.sum()), 3), None, dtype=object)
+        segmentos[:, 0], segmentos[:, 1] = longs[ii[do_tipo]], longs[jj[do_tipo]]
+        raios = np.full(segmentos.shape, RAIO_INTERNO, dtype=object)
+        raios[:, 2] = None
+        partes.append((dict(r=raios.ravel().tolist(), theta=segmentos.ravel().tolist()),
+                       dict(mode='lines', line=dict(color=cor, width=1.3), opacity=0.3, connectgaps=False, showlegend=False, hoverinfo='skip')))
+    partes.append((
+        dict(r=mid_r.tolist(), theta=mid_theta.tolist(), text=simbolos_asp.tolist(), textfont=dict(color=cores_asp.tolist())),
+        dict(mode='text', textfont=dict(size=16, family="Arial Black"), showlegend=False, hoverinfo='skip')
+    ))
+    return partes
+
+def partes_dinamicas(posicoes):
+    # Tudo o que muda com a data: aspectos e planetas, sempre na mesma quantidade de traces.
+    # Cada trace vem em duas partes: o que varia com a data (vai em cada quadro da animação)
+    # e o que é fixo (cores dos planetas, tamanhos, fontes), já que os pontos seguem a ordem de PLANETAS_MANDALA
+    # --- 3. PLANETAS E GRAUS ---
+    # Um trace por papel (grau, minuto, signo, marcadores, símbolo), com um ponto por planeta
+    hover = [f"{p['nome']}<br>{p['signo']}<br>{p['grau_int']}º{p['min_int']}'" for p in posicoes]
+    thetas_visuais = [p["long_visual"] for p in posicoes]
+    simbolos_signo = [SIMBOLOS_SIGNOS_UNICODE[int(p['long'] / 30) % 12] for p in posicoes]
+    raios = lambda raio: [raio] * len(posicoes)
+    comum = dict(showlegend=False, hovertemplate="%{hovertext}<extra></extra>")
+    partes = partes_aspectos(posicoes)
+
+    # Anotações Graus
+    partes.append((dict(theta=thetas_visuais, text=[f"{p['grau_int']:02d}°" for p in posicoes], hovertext=hover),
+                   dict(r=raios(6.3), mode='text', textfont=dict(size=25, color="black", family="Trebuchet MS"), **comum)))
+    # Anotações Minutos
+    partes.append((dict(theta=thetas_visuais, text=[f"{p['min_int']:02d}'" for p in posicoes], hovertext=hover),
+                   dict(r=raios(4.1), mode='text', textfont=dict(size=21, color="black", family="Trebuchet MS"), **comum)))
+    # Anotações Símbolo dos Signos (cor do elemento)
+    partes.append((dict(theta=thetas_visuais, text=simbolos_signo, hovertext=hover,
+                        textfont=dict(color=[CORES_SIGNOS.get(simbolo, "black") for simbolo in simbolos_signo])),
+                   dict(r=raios(5.2), mode='text', textfont=dict(size=32, family="DejaVu Sans"), **comum)))
+    # Marcadores internos e externos
+    for raio in (RAIO_INTERNO, 8.0):
+        partes.append((dict(theta=[p["long"] for p in posicoes], hovertext=hover),
+                       dict(r=raios(raio), mode='markers', marker=dict(size=8, color=[p["cor"] for p in posicoes], line=dict(color='black', width=0)), **comum)))
+    # Símbolo dos planetas (o Ascendente em texto menor, em preto)
+    partes.append((
+        dict(theta=thetas_visuais, hovertext=hover),
+        dict(r=raios(7.4), mode='text',
+             text=["Asc" if p.get("is_asc") else p['sym'] for p in posicoes],
+             textfont=dict(size=[32 if p.get("is_asc") else 44 for p in posicoes], color=["black" if p.get("is_asc") else p["cor"] for p in posicoes],
+                           family="'DejaVu Sans', 'Segoe UI Symbol', 'Apple Symbols', sans-serif"),
+             **comum)
+    ))
+    return partes
+
+def tracos_dinamicos(posicoes):
+    # Traces completos (parte variável + parte fixa)
+    tracos = []
+    for variavel, fixo in partes_dinamicas(posicoes):
+        traco = dict(fixo, **variavel)
+        if "textfont" in variavel:
+            traco["textfont"] = dict(fixo["textfont"], **variavel["textfont"])
+        tracos.append(go.Scatterpolar(**traco))
+    return tracos
+
+def calcular_julian_day(dt):
+    # Cálculo do Julian Day (Apenas argumentos posicionais para evitar TypeError)
+    hora_decimal = dt.hour + (dt.minute / 60.0) + (dt.second / 3600.0)
+    return swe.julday(dt.year, dt.month, dt.day, hora_decimal)
 
-    fig.add_trace(go.Scatterpolar(r=[10] * 361, theta=list(range(361)), mode='lines', 
-                                  line=dict(color="black", width=2), showlegend=False, hoverinfo='skip'))
+def criar_mandala_astrologica(dt):
+    jd = calcular_julian_day(dt)
+    # Todos os corpos de uma vez (coeficientes de Chebyshev, ou swisseph como reserva)
+    longs = coef.calcular_posicoes([jd], [p["id"] for p in PLANETAS_MANDALA], swe.FLG_SWIEPH)["long"][0]
 
-    # --- 3. PLANETAS E GRAUS ---
-    for p in posicoes:
-        hover_template = f"{p['nome']}<br>{p['signo']}<br>{p['grau_int']}º{p['min_int']}'<extra></extra>"
-        indice_signo_planeta = int(p['long'] / 30) % 12
-        simbolo_signo_planeta = SIMBOLOS_SIGNOS_UNICODE[indice_signo_planeta]
-        cor_elemento = CORES_SIGNOS.get(simbolo_signo_planeta, "black")
-
-        if p.get("is_asc"):
-            tamanho_fonte_principal = 32  # Tamanho menor para o texto "Asc"
-            texto_para_exibir = "Asc"
-            cor_texto = "black"
-        else:
-            tamanho_fonte_principal = 44  # Tamanho original para os símbolos dos planetas
-            texto_para_exibir = p['sym']
-            cor_texto = p["cor"]
-
-        # Anotações Graus
-        fig.add_trace(go.Scatterpolar(r=[6.3], theta=[p["long_visual"]], mode='text', text=[f"{p['grau_int']:02d}°"], 
-                                    textfont=dict(size=25, color="black", family="Trebuchet MS"), 
-                                    showlegend=False, hovertemplate=hover_template))
-        # Anotações Minutos
-        fig.add_trace(go.Scatterpolar(r=[4.1], theta=[p["long_visual"]], mode='text', text=[f"{p['min_int']:02d}'"], 
-                                    textfont=dict(size=21, color="black", family="Trebuchet MS"), 
-                                    showlegend=False, hovertemplate=hover_template))
-        # Anotações Símbolo dos Planetas
-        fig.add_trace(go.Scatterpolar(r=[5.2], theta=[p["long_visual"]], mode='text', text=[simbolo_signo_planeta], 
-                                    textfont=dict(size=32, color=cor_elemento, family="DejaVu Sans"), 
-                                    showlegend=False, hovertemplate=hover_template))
-        # Marcadores internos
-        fig.add_trace(go.Scatterpolar(r=[raio_interno], theta=[p["long"]], mode='markers', 
-                                    marker=dict(size=8, color=p["cor"], line=dict(color='black', width=0)), 
-                                    showlegend=False, hovertemplate=hover_template))
-        # Marcadores externos
-        fig.add_trace(go.Scatterpolar(r=[8.0], theta=[p["long"]], mode='markers', 
-                                    marker=dict(size=8, color=p["cor"], line=dict(color='black', width=0)), 
-                                    showlegend=False, hovertemplate=hover_template))
-       # Símbolo dos planetas
-        fig.add_trace(go.Scatterpolar(
-            r=[7.4], theta=[p["long_visual"]], 
-            mode='text', 
-            text=[texto_para_exibir], # Adicionado Negrito via tag HTML
-            textfont=dict(size=tamanho_fonte_principal, color=cor_texto, family="'DejaVu Sans', 'Segoe UI Symbol', 'Apple Symbols', sans-serif"), 
-            showlegend=False, hovertemplate=hover_template
-        ))
+    # Cópia da camada estática em cache; daqui em diante só entram os traces que mudam com a data
+    fig = go.Figure(camada_estatica())
+    fig.add_traces(tracos_dinamicos(montar_posicoes(longs, asc_valor)))
+    return fig
 
-    # --- LAYOUT FINAL ---
+def criar_animacao_mandala(dt, janela, local=None):
+    # Quadros de toda a janela ao redor de dt (UT) calculados de uma vez e enviados ao navegador:
+    # o slider troca só os traces dinâmicos, sem voltar ao servidor
+    meia_largura, passo = JANELAS_ANIMACAO[janela]
+    n = int(meia_largura / passo)
+    deslocamentos = np.arange(-n, n + 1)
+    jds = calcular_julian_day(dt) + deslocamentos * (passo / timedelta(days=1))
+    longs = coef.calcular_posicoes(jds, [p["id"] for p in PLANETAS_MANDALA], swe.FLG_SWIEPH)["long"]
+    ascs = [swe.houses(jd, local[0], local[1], b'P')[1][0] for jd in jds] if local else [None] * len(jds)
+    posicoes = [montar_posicoes(longs[k], ascs[k]) for k in range(len(jds))]
+
+    fig = go.Figure(camada_estatica())
+    fig.add_traces(tracos_dinamicos(posicoes[n]))
+    indices = list(range(len(camada_estatica().data), len(fig.data)))
+    # Cada quadro leva só a parte variável dos traces: o Plotly mescla com a parte fixa já desenhada
+    # (e a validação dos quadros, que o Plotly sempre faz na atribuição, fica bem mais leve)
+    fig.frames = [dict(data=[dict(variavel, type="scatterpolar") for variavel, _ in partes_dinamicas(pos)], traces=indices, name=str(k))
+                  for k, pos in enumerate(posicoes)]
+
+    # Rótulos no horário de Brasília (UT - 3h), como o restante da página
+    datas = [dt - timedelta(hours=3) + int(k) * passo for k in deslocamentos]
+    formato = '%d/%m/%Y' if passo >= timedelta(days=1) else '%d/%m %H:%M'
+    animar = dict(mode="immediate", frame=dict(duration=0, redraw=True), transition=dict(duration=0))
     fig.update_layout(
-            width=850, height=850, autosize=False, uirevision="constant",
-            polar=dict(
-                radialaxis=dict(visible=False, range=[0, 10]),
-                angularaxis=dict(
-                    direction="counterclockwise", 
-                    rotation=180, # Áries à esquerda
-                    showgrid=False, 
-                    gridcolor="rgba(0,0,0,0.1)",
-                    showticklabels=False
-            )
-        ),
-        hoverlabel=dict(bgcolor="black", font_size=14, font_family="Arial"),
-        showlegend=False,
-        margin=dict(t=30, b=30, l=30, r=30, pad=0),
-        paper_bgcolor="#0e1117",
-        dragmode=False
+        height=950, margin=dict(t=30, b=130, l=30, r=30, pad=0),
+        sliders=[dict(active=n, currentvalue=dict(prefix="", font=dict(color="white", size=16)), font=dict(color="white"),
+                      pad=dict(t=10), steps=[dict(method="animate", args=[[str(k)], animar], label=d.strftime(formato)) for k, d in enumerate(datas)])],
+        updatemenus=[dict(type="buttons", direction="left", x=0, y=0, xanchor="left", yanchor="top", pad=dict(t=60),
+                          buttons=[dict(label="▶", method="animate", args=[None, dict(animar, frame=dict(duration=80, redraw=True), fromcurrent=True)]),
+                                   dict(label="⏸", method="animate", args=[[None], animar])])]
     )
     return fig
 
@@ -444,7 +509,10 @@ st.subheader(f"{st.session_state.data_ref.strftime('%d/%m/%Y %H:%M')} - Horário
 col1, col2 = st.columns([1.5, 1])
 
 with col1:
-    fig_mandala = criar_mandala_astrologica(data_para_o_calculo_ut)
+    if modo_animacao:
+        fig_mandala = criar_animacao_mandala(data_para_o_calculo_ut, janela_animacao, local_asc)
+    else:
+        fig_mandala = criar_mandala_astrologica(data_para_o_calculo_ut)
     st.plotly_chart(
         fig_mandala, 
         use_container_width=False,
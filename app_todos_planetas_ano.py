@@ -3,9 +3,11 @@ import swisseph as swe
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import numpy as np
-from datetime import datetime
 import io
+import efemerides as efe
+import fila_calculo as fila
+import cache_memoria as cm
+import tarefas
 
 if 'fig_gerada' not in st.session_state:
     st.session_state.fig_gerada = None
@@ -47,6 +49,13 @@ ASPECTOS = {
     90: ("Quadratura", "□"), 120: ("Trígono", "△"), 150: ("Quincúncio", "⚻"), 180: ("Oposição", "☍")
 }
 
+# Símbolo do aspecto indexado pelo código de efe.codigo_aspecto (-1 = sem aspecto)
+SIMBOLOS_ASPECTO = [ASPECTOS[k * 30][1] for k in range(7)] + [""]
+
+# Limiares de intensidade convertidos em distância ao grau natal
+DIST_PICO = efe.distancia_para_intensidade(0.98)
+DIST_FORTE = efe.distancia_para_intensidade(0.841)
+
 MESES = {
     1: "janeiro", 2: "fevereiro", 3: "marco", 4: "abril",
     5: "maio", 6: "junho", 7: "julho", 8: "agosto",
@@ -119,17 +128,10 @@ def obter_simbolo_aspecto(long1, long2):
         if abs(diff - angulo) <= 5: return simbolo
     return ""
 
-def gerar_texto_relatorio(df, planeta_alvo_nome, long_natal_ref, id_planeta_transito):
-    col_p = planeta_alvo_nome.upper()
-    if col_p not in df.columns or long_natal_ref is None:
+def gerar_texto_relatorio(eventos_planeta, planeta_alvo_nome, long_natal_ref):
+    if not eventos_planeta or long_natal_ref is None:
         return []
 
-    # Função interna para calcular o signo real na data do pico
-    def calcular_signo_real(data_pico):
-        jd = swe.julday(data_pico.year, data_pico.month, data_pico.day, data_pico.hour + data_pico.minute/60.0)
-        res, _ = swe.calc_ut(jd, id_planeta_transito, swe.FLG_SWIEPH)
-        return SIGNOS[int(res[0] / 30) % 12]
-
     # Função para pegar APENAS o símbolo do aspecto
     def obter_simbolo_aspecto(s_transito, s_natal):
         try:
@@ -145,60 +147,35 @@ def gerar_texto_relatorio(df, planeta_alvo_nome, long_natal_ref, id_planeta_tran
         except:
             return ""
 
-    LIMIAR_INFLUENCIA = 0.01
-    LIMIAR_FORTE = 0.841
-
-    mask_inf = df[col_p] > LIMIAR_INFLUENCIA
-    if not mask_inf.any(): return []
-
-    df_copy = df.copy()
-    df_copy['group_inf'] = (mask_inf != mask_inf.shift()).cumsum()
-    curvas = df_copy[mask_inf].groupby('group_inf')
-
     relatorios_planeta = []
     signo_natal_nome = get_signo(long_natal_ref)
 
-    for _, dados_curva in curvas:
-        if len(dados_curva) < 2: continue
+    # Cada janela de orbe (5°) é um trânsito; entrada, saída e picos já vêm exatos do solucionador
+    for janela in eventos_planeta["transito"]:
+        if janela["saida"] <= janela["entrada"]: continue
         
-        data_ini = dados_curva['date'].min().strftime('%d/%m/%Y')
-        data_fim = dados_curva['date'].max().strftime('%d/%m/%Y')
+        data_ini = efe.jd_para_datetime(janela["entrada"]).strftime('%d/%m/%Y')
+        data_fim = efe.jd_para_datetime(janela["saida"]).strftime('%d/%m/%Y')
         
-        ponto_max = dados_curva.loc[dados_curva[col_p].idxmax()]
-        signo_transito = calcular_signo_real(ponto_max['date'])
+        # Signo real no instante de maior intensidade
+        signo_transito = get_signo(janela["maximo"]["long"])
         
         # Obtém apenas o símbolo (ex: ☍, ✶, □)
         simb_asp = obter_simbolo_aspecto(signo_transito, signo_natal_nome)
         
-        mask_forte = dados_curva[col_p] >= LIMIAR_FORTE
         intervalos_fortes_texto = []
-        
-        if mask_forte.any():
-            g_fortes = (mask_forte != mask_forte.shift()).cumsum()
-            ilhas = dados_curva[mask_forte].groupby(g_fortes)
+        for forte in eventos_planeta["forte"]:
+            if not janela["entrada"] <= forte["maximo"]["jd"] <= janela["saida"]: continue
             
-            for _, ilha in ilhas:
-                f_ini = ilha['date'].min().strftime('%d/%m/%Y')
-                f_fim = ilha['date'].max().strftime('%d/%m/%Y')
-                
-                # Lógica de Picos
-                v = ilha[col_p].values
-                d = ilha['date'].values
-                picos_datas = []
-                if len(v) <= 3:
-                    picos_datas.append(pd.to_datetime(d[np.argmax(v)]))
-                else:
-                    for i in range(1, len(v) - 1):
-                        if v[i] > v[i-1] and v[i] >= v[i+1]:
-                            picos_datas.append(pd.to_datetime(d[i]))
-                    if not picos_datas:
-                        picos_datas.append(pd.to_datetime(d[np.argmax(v)]))
-
-                str_picos = " e ".join([dt.strftime('%d/%m/%Y') for dt in sorted(list(set(picos_datas)))])
-                intervalos_fortes_texto.append(
-                    f"**Período de intensidade forte**: {f_ini} até {f_fim}  \n"
-                    f"**Pico**: {str_picos}"
-                )
+            f_ini = efe.jd_para_datetime(forte["entrada"]).strftime('%d/%m/%Y')
+            f_fim = efe.jd_para_datetime(forte["saida"]).strftime('%d/%m/%Y')
+            
+            picos = forte["picos"] or [forte["maximo"]]
+            str_picos = " e ".join(efe.jd_para_datetime(pk["jd"]).strftime('%d/%m/%Y %H:%M') for pk in picos)
+            intervalos_fortes_texto.append(
+                f"**Período de intensidade forte**: {f_ini} até {f_fim}  \n"
+                f"**Pico**: {str_picos}"
+            )
 
         # Título formatado apenas com o símbolo (ex: JÚPITER em Câncer ✶)
         texto = (f"### {planeta_alvo_nome.title()} em {signo_transito} {simb_asp}  \n"
@@ -211,55 +188,100 @@ def gerar_texto_relatorio(df, planeta_alvo_nome, long_natal_ref, id_planeta_tran
         
     return relatorios_planeta
 
-@st.cache_data(show_spinner=False)
-def calcular_dados_efemerides(ano, mes, usar_lua, alvos, monitorados):
-        jd_start = swe.julday(ano, mes if mes else 1, 1)
-        jd_end = swe.julday(ano + (1 if not mes else 0), (mes + 1 if mes and mes < 12 else 1) if mes else 1, 1)
-        steps = np.arange(jd_start, jd_end, 0.005 if usar_lua and mes else 0.05)
-        flags = swe.FLG_SWIEPH | swe.FLG_SPEED
+@cm.memoizar(64)
+def calcular_series_periodo(ano, mes, ids_corpos):
+        # Um mês (bloco) das séries, cada corpo no seu passo nativo; a grade do gráfico é montada depois, por Hermite
+        return fila.executar(tarefas.series_periodo, ano, mes, ids_corpos)
+
+def normalizar_alvos(ano, mes, usar_lua, alvos, monitorados, progresso=None):
+        # Só o que entra no cálculo, com o grau em texto já convertido ("27.0" e "27" são a mesma chave);
+        # o callback de progresso fica de fora
+        return (ano, mes if usar_lua else None, usar_lua, [(a["planeta"], a["signo"], dms_to_dec(a["grau"])) for a in alvos],
+                [(p["id"], p["nome"]) for p in monitorados])
+
+@cm.memoizar(256, normalizar_alvos)
+def calcular_dados_efemerides(ano, mes, usar_lua, alvos, monitorados, progresso=None):
+        # Trabalho pesado na fila de cálculo (fora do processo do Streamlit), compartilhado entre sessões;
+        # todos os alvos num único pedido, com o progresso mês a mês vindo de dentro dele
+        longs_natais = [(SIGNOS.index(alvo["signo"]) * 30) + dms_to_dec(alvo["grau"]) for alvo in alvos]
+        corpos = [{"id": p["id"], "nome": p["nome"]} for p in monitorados]
+        return fila.executar(tarefas.transitos_alvos, ano, mes, efe.passo_grafico(mes if usar_lua else None),
+                             longs_natais, [alvo["planeta"] for alvo in alvos], corpos, DIST_FORTE, progresso=progresso)
+
+@cm.memoizar(32, normalizar_alvos)
+def calcular_tabelas_previa(ano, mes, usar_lua, alvos, monitorados):
+        # Mesmo motor, sobre séries grossas e no passo da prévia, sem o solucionador de eventos: só
+        # para a primeira pintura, antes das séries finas mês a mês
+        longs_natais = [(SIGNOS.index(alvo["signo"]) * 30) + dms_to_dec(alvo["grau"]) for alvo in alvos]
+        corpos = [{"id": p["id"], "nome": p["nome"]} for p in monitorados]
+        return fila.executar(tarefas.tabelas_previa, ano, mes, efe.passo_grafico(mes if usar_lua else None, previa=True),
+                             longs_natais, [alvo["planeta"] for alvo in alvos], corpos)
+
+def montar_figura(resultados, eventos_alvos, alvos, lista_p, ano):
+        # Sem eventos (prévia em grade grossa), só as curvas, sem os marcadores de pico
+        fig = make_subplots(
+            rows=len(alvos), cols=1,
+            subplot_titles=[f"<b>{a['planeta']} Natal em {a['signo']} {a['grau']}°</b>" for a in alvos],
+            vertical_spacing=0.025,
+            shared_xaxes=True
+        )
+    
+        for idx, alvo in enumerate(alvos):
+            tabela = resultados["tabelas"][alvo["planeta"]]
 
-        dict_dfs = {}
+            for p in lista_p:
+                if p['nome'] in tabela["corpo"].cat.categories:
+                    trechos = efe.trechos_hover(tabela[tabela["corpo"] == p['nome']], dms_to_dec(alvo["grau"]), SIGNOS, SIMBOLOS_ASPECTO)
+                    # Gráfico de Área (Intensidade), um trace por trecho com signo, direção e aspecto constantes
+                    for n, trecho in enumerate(trechos):
+                        fig.add_trace(go.Scatter(
+                            x=resultados["date"][trecho["fatia"]], y=trecho["intensidade"],
+                            mode='lines', name=p['nome'],
+                            legendgroup=p['nome'],
+                            showlegend=(idx == 0 and n == 0), # Mostra legenda apenas no primeiro subplot
+                            line=dict(color=p['cor'], width=2.5),
+                            fill='tozeroy',
+                            fillcolor=hex_to_rgba(p['cor'], 0.15),
+                            customdata=trecho["customdata"],
+                            hovertemplate=trecho["hovertemplate"],
+                            connectgaps=False
+                        ), row=idx+1, col=1)
 
-        for alvo in alvos:
-            grau_decimal = dms_to_dec(alvo["grau"])
-            idx_signo_natal = SIGNOS.index(alvo["signo"])
-            long_natal_absoluta = (idx_signo_natal * 30) + grau_decimal
+                    # Marcadores de Picos (instantes exatos do solucionador)
+                    picos = [pk for janela in eventos_alvos[alvo["planeta"]][p['nome']]["transito"] for pk in janela["picos"] if pk["dist"] < DIST_PICO] if eventos_alvos else []
             
-            alvo_data = []
-            for jd in steps:
-                y, m, d, h = swe.revjul(jd)
-                row = {'date': datetime(y, m, d, int(h), int((h%1)*60))}
-                
-                for p in monitorados:
-                    res, _ = swe.calc_ut(jd, p["id"], flags)
-                    long_abs, vel = res[0], res[3]
-                    
-                    pos_no_signo = long_abs % 30
-                    # Cálculo de distância considerando a volta do zodíaco (orb de 5 graus)
-                    graus_int = int(pos_no_signo)
-                    minutos_int = int((pos_no_signo - graus_int) * 60)
-                    dist = abs(((pos_no_signo - grau_decimal + 15) % 30) - 15)
-                    
-                    if dist <= 5.0:
-                        # Cálculo da Força (Exponencial)
-                        val = np.exp(-0.5 * (dist / 1.7)**2)
-                        
-                        # Info Detalhada
-                        status = "(R)" if vel < 0 else "(D)"
-                        simb = obter_simbolo_aspecto(long_abs, long_natal_absoluta)
-                        int_txt = "Forte" if dist <= 1.0 else "Médio" if dist <= 2.5 else "Fraco"
-                        
-                        row[p["nome"]] = val
-                        row[f"{p['nome']}_info"] = f"{get_signo(long_abs)} {status} {graus_int:02d}°{minutos_int:02d}' - {int_txt} {simb}"
-                    else:
-                        row[p["nome"]] = np.nan
-                        row[f"{p['nome']}_info"] = ""
-                
-                alvo_data.append(row)
+                    if picos:
+                        datas_picos = [efe.jd_para_datetime(pk["jd"]) for pk in picos]
+                        fig.add_trace(go.Scatter(
+                            x=datas_picos, y=efe.intensidade([pk["dist"] for pk in picos]) + 0.04,
+                            mode='markers+text',
+                            text=[d.strftime('%d/%m') for d in datas_picos],
+                            textposition="top center",
+                            # textfont=dict(family="Arial", size=10, color="white"),
+                            marker=dict(symbol="triangle-down", color=p['cor'], size=8),
+                            legendgroup=p['nome'], showlegend=False, hoverinfo='skip'
+                        ), row=idx+1, col=1)
 
-            dict_dfs[alvo["planeta"]] = pd.DataFrame(alvo_data)
+            fig.update_yaxes(
+                title_text=f"Intensidade de {alvo['planeta']}", 
+                row=idx + 1, 
+                col=1,
+                range=[0, 1.3], 
+                fixedrange=True
+            )
+
+        fig.update_layout(
+            height=520 * len(alvos), # Altura proporcional ao número de alvos
+            title=dict(text=f"<b>Revolução Planetária {ano}</b>", x=0.5, y=0.98, xanchor = "center", yanchor="top", font = dict(size = 24)),
+            template='plotly_white',
+            hovermode='x unified', dragmode='pan', margin=dict(t=240, b=50, l=50, r=50),
+            legend=dict(orientation="h", yanchor="top", y=0.97, yref="container", xanchor="center", x=0.5)
+        )
 
-        return dict_dfs
+        fig.update_xaxes(type='date', tickformat='%d/%m\n%Y', hoverformat='%d/%m/%Y %H:%M', showticklabels=True, visible=True)
+        #fig.update_yaxes(title='Intensidade', range=[0, 1.3], fixedrange=True)
+        fig.update_annotations(patch=dict(font=dict(size=14), yshift=20))
+        return fig
 
 # --- INTERFACE LATERAL ---
 planetas_monitorados = [
@@ -331,92 +353,67 @@ st.sidebar.divider()
 
 # --- PROCESSAMENTO ---
 if st.sidebar.button("Gerar Gráficos", help="Pode levar um tempo para processar.", use_container_width=True):
-    with st.spinner("Sincronizando efemérides..."):
-        
-        lista_p = planetas_monitorados.copy()
-        if incluir_lua:
-            lista_p.insert(1, {"id": swe.MOON, "nome": "LUA", "cor": "#A6A6A6"})
-
-        resultados = calcular_dados_efemerides(ano_analise, mes_selecionado, incluir_lua, alvos_input, lista_p)
-
-        fig = make_subplots(
-            rows=len(alvos_input), cols=1,
-            subplot_titles=[f"<b>{a['planeta']} Natal em {a['signo']} {a['grau']}°</b>" for a in alvos_input],
-            vertical_spacing=0.025,
-            shared_xaxes=True
-        )
-        
-        for idx, alvo in enumerate(alvos_input):
-            df = resultados[alvo["planeta"]]
-
-            for p in lista_p:
-                if p['nome'] in df.columns:
-                    # Gráfico de Área (Intensidade)
-                    fig.add_trace(go.Scatter(
-                        x=df['date'], y=df[p['nome']],
-                        mode='lines', name=p['nome'],
-                        legendgroup=p['nome'],
-                        showlegend=(idx == 0), # Mostra legenda apenas no primeiro subplot
-                        line=dict(color=p['cor'], width=2.5),
-                        fill='tozeroy',
-                        fillcolor=hex_to_rgba(p['cor'], 0.15),
-                        customdata=df[f"{p['nome']}_info"],
-                        hovertemplate="<b>%{customdata}</b><extra></extra>",
-                        connectgaps=False
-                    ), row=idx+1, col=1)
-
-                    # Marcadores de Picos
-                    serie_p = df[p['nome']].fillna(0)
-                    peak_mask = (serie_p > 0.98) & (serie_p > serie_p.shift(1)) & (serie_p > serie_p.shift(-1))
-                    picos = df[peak_mask]
-                
-                    if not picos.empty:
-                        fig.add_trace(go.Scatter(
-                            x=picos['date'], y=picos[p['nome']] + 0.04,
-                            mode='markers+text',
-                            text=picos['date'].dt.strftime('%d/%m'),
-                            textposition="top center",
-                            # textfont=dict(family="Arial", size=10, color="white"),
-                            marker=dict(symbol="triangle-down", color=p['cor'], size=8),
-                            legendgroup=p['nome'], showlegend=False, hoverinfo='skip'
-                        ), row=idx+1, col=1)
-
-            fig.update_yaxes(
-                title_text=f"Intensidade de {alvo['planeta']}", 
-                row=idx + 1, 
-                col=1,
-                range=[0, 1.3], 
-                fixedrange=True
-            )
-
-        # alvo_principal = alvos_input[0]
-        # p_nome = alvo_principal['planeta'].lower()
-        # s_nome = alvo_principal['signo'].lower()
-        # g_limpo = str(alvo_principal['grau']).replace('.','_')
-
-        if incluir_lua:
-            nome_mes = MESES.get(mes_selecionado).lower()
-            file_name_grafico = f"revolucao_planetaria_{nome_mes}_{ano_analise}_todos_planetas_natais.html"
-        else:
-            file_name_grafico = f"revolucao_planetaria_{ano_analise}_todos_planetas_natais.html"
-
-        fig.update_layout(
-            height=520 * len(alvos_input), # Altura proporcional ao número de alvos
-            title=dict(text=f"<b>Revolução Planetária {ano_analise}</b>", x=0.5, y=0.98, xanchor = "center", yanchor="top", font = dict(size = 24)),
-            template='plotly_white',
-            hovermode='x unified', dragmode='pan', margin=dict(t=240, b=50, l=50, r=50),
-            legend=dict(orientation="h", yanchor="top", y=0.97, yref="container", xanchor="center", x=0.5)
-        )
-
-        fig.update_xaxes(type='date', tickformat='%d/%m\n%Y', hoverformat='%d/%m/%Y %H:%M', showticklabels=True, visible=True)
-        #fig.update_yaxes(title='Intensidade', range=[0, 1.3], fixedrange=True)
-        fig.update_annotations(patch=dict(font=dict(size=14), yshift=20))
-
-        st.session_state.fig_gerada = fig
-        st.session_state.file_name = file_name_grafico
+    # Barra de progresso em vez de spinner: o cálculo anda mês a mês (séries e depois trânsitos), e cada
+    # atualização da barra é o ponto em que o Streamlit interrompe uma execução obsoleta
+    barra_progresso = st.progress(0.0, text="Sincronizando efemérides...")
+
+    lista_p = planetas_monitorados.copy()
+    if incluir_lua:
+        lista_p.insert(1, {"id": swe.MOON, "nome": "LUA", "cor": "#A6A6A6"})
+    ids_corpos = [p["id"] for p in lista_p]
+
+    # Primeira pintura: as mesmas curvas a partir de séries grossas (um único trabalho) numa grade
+    # grossa (1 dia no ano), sem os eventos; o gráfico fino ocupa o lugar da prévia assim que fica pronto
+    area_previa = st.empty()
+    previa = calcular_tabelas_previa(ano_analise, mes_selecionado, incluir_lua, alvos_input, lista_p)
+    # Chave própria: sem eventos no período, a prévia e o gráfico fino saem iguais (mesmo ID automático)
+    area_previa.plotly_chart(montar_figura(previa, None, alvos_input, lista_p, ano_analise), use_container_width=True, config={'scrollZoom': True}, key="previa")
+    meses = [mes_selecionado] if mes_selecionado else range(1, 13)
+    series = efe.juntar_series(efe.processar_em_blocos(
+        lambda mes: calcular_series_periodo(ano_analise, mes, ids_corpos), [(mes,) for mes in meses],
+        progresso=lambda f: barra_progresso.progress(0.5 * f, text="Sincronizando efemérides...")), ids_corpos)
+    resultados, eventos_alvos = calcular_dados_efemerides(
+        ano_analise, mes_selecionado, incluir_lua, alvos_input, lista_p,
+        progresso=lambda f: barra_progresso.progress(0.5 + 0.5 * f, text="Calculando trânsitos dos alvos natais..."))
+
+    fig = montar_figura(resultados, eventos_alvos, alvos_input, lista_p, ano_analise)
+
+    # alvo_principal = alvos_input[0]
+    # p_nome = alvo_principal['planeta'].lower()
+    # s_nome = alvo_principal['signo'].lower()
+    # g_limpo = str(alvo_principal['grau']).replace('.','_')
+
+    if incluir_lua:
+        nome_mes = MESES.get(mes_selecionado).lower()
+        file_name_grafico = f"revolucao_planetaria_{nome_mes}_{ano_analise}_todos_planetas_natais.html"
+    else:
+        file_name_grafico = f"revolucao_planetaria_{ano_analise}_todos_planetas_natais.html"
+
+    st.session_state.fig_gerada = fig
+    st.session_state.file_name = file_name_grafico
+    st.session_state.resultados_data = eventos_alvos
+    st.session_state.erro_hermite = max(serie["erro"] for serie in series.values()) * 3600
+    # Todas as tabelas de trânsitos juntas, só para o tamanho por linha
+    tabelas = pd.concat(resultados["tabelas"].values())
+    st.session_state.tamanho_tabelas = (len(tabelas), efe.bytes_por_linha(tabelas))
+    barra_progresso.empty()
+    area_previa.empty()
+
+    # Em segundo plano, um trabalho por vez: as séries dos meses vizinhos da Lua (ou dos anos
+    # vizinhos), com os mesmos argumentos de calcular_series_periodo, para a próxima geração
+    if mes_selecionado:
+        vizinhos = [(ano_analise, mes) for mes in (mes_selecionado + 1, mes_selecionado - 1) if 1 <= mes <= 12]
+    else:
+        vizinhos = [(a, mes) for a in (ano_analise + 1, ano_analise - 1) if 1900 <= a <= 2100 for mes in range(1, 13)]
+    for a, mes in vizinhos:
+        fila.antecipar(tarefas.series_periodo, a, mes, ids_corpos)
 
 if st.session_state.fig_gerada is not None:
     st.plotly_chart(st.session_state.fig_gerada, use_container_width=True, config={'scrollZoom': True})
+    if st.session_state.get("erro_hermite") is not None:
+        linhas, bytes_linha = st.session_state.tamanho_tabelas
+        st.caption(f"Posições interpoladas (Hermite) a partir do passo nativo de cada corpo. Erro máximo (conferido com o swisseph): {st.session_state.erro_hermite:.2f}″ · "
+                   f"Tabelas de trânsitos: {linhas} linhas, {bytes_linha:.0f} bytes/linha")
     buf = io.StringIO()
     st.session_state.fig_gerada.write_html(buf, config={'scrollZoom': True}, include_plotlyjs=True)
 
@@ -432,12 +429,12 @@ if st.session_state.fig_gerada is not None:
         long_natal_abs = (idx_s_natal * 30) + dms_to_dec(alvo["grau"])
         
         with st.expander(f"Trânsitos sobre {alvo['planeta']} em {alvo['signo']}", expanded=False):
-            df_alvo = resultados[alvo["planeta"]]
+            eventos_alvo = st.session_state.resultados_data[alvo["planeta"]]
             encontrou = False
             
             for p_lento in lentos:
-                # Passamos o df, o nome, a longitude natal e o ID do planeta lento
-                relatorio = gerar_texto_relatorio(df_alvo, p_lento["nome"], long_natal_abs, p_lento["id"])
+                # Passamos os eventos exatos, o nome e a longitude natal
+                relatorio = gerar_texto_relatorio(eventos_alvo.get(p_lento["nome"]), p_lento["nome"], long_natal_abs)
                 if relatorio:
                     encontrou = True
                     for bloco in relatorio:
@@ -455,4 +452,7 @@ if st.session_state.fig_gerada is not None:
         use_container_width=True
     )   
 else:
-    st.info("Utilize o menu lateral para configurar os dados e clique em 'Gerar Gráficos'.")
\ No newline at end of file
+    st.info("Utilize o menu lateral para configurar os dados e clique em 'Gerar Gráficos'.")
+
+# Contadores do cache em memória (acertos, faltas, descartes) para o Prometheus, se CACHE_METRICAS estiver definido
+cm.exportar_metricas()
@@ -0,0 +1,57 @@
+import os
+import json
+import hashlib
+import tempfile
+import swisseph as swe
+import numpy as np
+
+# --- CACHE EM DISCO ENDEREÇADO POR CONTEÚDO ---
+# Arrays de posições gravados como .npy, com o nome derivado (sha256) de tudo o que
+# determina o resultado: parâmetros do cálculo, flags, versão do swisseph e a origem dos
+# dados (qual arquivo de coeficientes, ou o swisseph direto; ver efemerides). Qualquer processo
+# (os três apps, os scripts) abre o mesmo arquivo só para leitura com memmap, sem cópia,
+# e o cache sobrevive a reinícios e novos deploys. Mudou a versão, as flags ou a origem, mudou a chave.
+
+DIRETORIO_PADRAO = os.environ.get("EFEMERIDES_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_efemerides"))
+VERSAO_FORMATO = 1
+
+def chave(partes):
+    """Chave (sha256) dos parâmetros, acrescida da versão do swisseph e do formato do cache."""
+    conteudo = dict(partes, versao_swe=swe.version, formato=VERSAO_FORMATO)
+    texto = json.dumps(conteudo, sort_keys=True, default=float)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+def _caminho(k, diretorio):
+    # Dois níveis de pasta para não acumular milhares de arquivos num só diretório
+    return os.path.join(diretorio, k[:2], f"{k}.npy")
+
+def carregar(k, diretorio=DIRETORIO_PADRAO):
+    """Array gravado sob a chave, aberto com memmap só para leitura; None se não existir."""
+    try:
+        return np.load(_caminho(k, diretorio), mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+def gravar(k, array, diretorio=DIRETORIO_PADRAO):
+    """Grava o array de forma atômica (arquivo temporário + os.replace); devolve o caminho ou None."""
+    caminho = _caminho(k, diretorio)
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(caminho), suffix=".tmp", delete=False) as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(f.name, caminho)
+        return caminho
+    except OSError:
+        # Disco somente leitura ou sem espaço: o cache é só um atalho, o cálculo segue
+        return None
+
+def obter(partes, calcular, diretorio=DIRETORIO_PADRAO):
+    """Devolve o array em cache para os parâmetros; na falta, calcula, grava e reabre com memmap."""
+    k = chave(partes)
+    array = carregar(k, diretorio)
+    if array is not None:
+        return array
+    array = np.asarray(calcular())
+    if gravar(k, array, diretorio) is None:
+        return array
+    return carregar(k, diretorio)
@@ -0,0 +1,147 @@
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# --- CACHE EM MEMÓRIA COM ORÇAMENTO ---
+# Substitui o @st.cache_data, que não tem limite: cada função cacheada recebe um orçamento
+# em bytes e, ao estourá-lo, descarta as entradas menos usadas (LRU pelo tamanho estimado).
+# As chaves são normalizadas antes do hash (listas viram tuplas, dicts são ordenados,
+# floats arredondados, e cada função pode ainda trazer a sua normalização, ex.: "27.0" = "27").
+# Acertos, faltas e descartes de cada função ficam em contadores; com CACHE_METRICAS
+# apontando para um arquivo, exportar_metricas grava esses contadores no formato texto do
+# Prometheus (para o textfile collector do node_exporter).
+#
+# O resultado é devolvido sem cópia: quem chama não deve alterá-lo.
+
+ARQUIVO_METRICAS = os.environ.get("CACHE_METRICAS")
+CASAS_FLOAT = 9
+
+_trava = threading.Lock()
+_funcoes = {}
+
+def tamanho(obj):
+    """Bytes ocupados pelo objeto, estimados (arrays e DataFrames pelo conteúdo, containers somados)."""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(tamanho(k) + tamanho(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(tamanho(v) for v in obj)
+    return sys.getsizeof(obj)
+
+def normalizar(obj):
+    """Forma canônica de um argumento para a chave: sem diferença entre lista e tupla, ordem de dict etc."""
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float):
+        return round(obj, CASAS_FLOAT) + 0.0
+    if isinstance(obj, dict):
+        return tuple(sorted((normalizar(k), normalizar(v)) for k, v in obj.items()))
+    if isinstance(obj, (list, tuple, range)):
+        return tuple(normalizar(v) for v in obj)
+    if isinstance(obj, (set, frozenset)):
+        return tuple(sorted(normalizar(v) for v in obj))
+    return obj
+
+def chave(args, kwargs):
+    return hashlib.sha256(pickle.dumps((normalizar(args), normalizar(kwargs)))).hexdigest()
+
+def _estado(nome, codigo, orcamento):
+    with _trava:
+        estado = _funcoes.get(nome)
+        if estado is None or estado["codigo"] != codigo:
+            # Primeira vez (ou código alterado): entradas antigas não valem mais
+            estado = {"codigo": codigo, "entradas": OrderedDict(), "bytes": 0,
+                      "acertos": 0, "faltas": 0, "descartes": 0, "recusas": 0}
+            _funcoes[nome] = estado
+        estado["orcamento"] = orcamento
+        return estado
+
+def memoizar(orcamento_mb, normalizar_args=None):
+    """Decorador: cache LRU com orçamento de `orcamento_mb` MB para a função.
+
+    `normalizar_args(*args, **kwargs)`, se informado, devolve os argumentos na forma que
+    define a chave (ex.: graus em texto já convertidos para número).
+    Funções redefinidas a cada rerun do Streamlit reaproveitam o mesmo cache (pelo nome).
+    """
+    def decorador(funcao):
+        nome = f"{os.path.basename(funcao.__code__.co_filename)}:{funcao.__qualname__}"
+        codigo = hashlib.sha256(funcao.__code__.co_code).hexdigest()
+        estado = _estado(nome, codigo, int(orcamento_mb * 2**20))
+
+        def envolvida(*args, **kwargs):
+            k = chave(normalizar_args(*args, **kwargs), {}) if normalizar_args else chave(args, kwargs)
+            with _trava:
+                if k in estado["entradas"]:
+                    estado["entradas"].move_to_end(k)
+                    estado["acertos"] += 1
+                    return estado["entradas"][k][0]
+                estado["faltas"] += 1
+
+            resultado = funcao(*args, **kwargs)
+            n_bytes = tamanho(resultado)
+            with _trava:
+                if n_bytes > estado["orcamento"]:
+                    # Maior que o orçamento inteiro: devolve sem guardar
+                    estado["recusas"] += 1
+                    return resultado
+                if k not in estado["entradas"]:
+                    estado["entradas"][k] = (resultado, n_bytes)
+                    estado["bytes"] += n_bytes
+                while estado["bytes"] > estado["orcamento"]:
+                    _, (_, liberados) = estado["entradas"].popitem(last=False)
+                    estado["bytes"] -= liberados
+                    estado["descartes"] += 1
+            return resultado
+
+        def limpar():
+            with _trava:
+                estado["entradas"].clear()
+                estado["bytes"] = 0
+
+        envolvida.__name__, envolvida.__doc__, envolvida.__wrapped__ = funcao.__name__, funcao.__doc__, funcao
+        envolvida.limpar = limpar
+        return envolvida
+    return decorador
+
+def estatisticas():
+    """Contadores por função: acertos, faltas, descartes, recusas, entradas, bytes e orçamento."""
+    with _trava:
+        return {
+            nome: {"acertos": e["acertos"], "faltas": e["faltas"], "descartes": e["descartes"], "recusas": e["recusas"],
+                   "entradas": len(e["entradas"]), "bytes": e["bytes"], "orcamento": e["orcamento"]}
+            for nome, e in _funcoes.items()
+        }
+
+def metricas_prometheus():
+    """Os contadores de estatisticas() no formato texto do Prometheus."""
+    tipos = {"acertos": "counter", "faltas": "counter", "descartes": "counter", "recusas": "counter",
+             "entradas": "gauge", "bytes": "gauge", "orcamento": "gauge"}
+    dados = estatisticas()
+    linhas = []
+    for campo, tipo in tipos.items():
+        metrica = f"cache_memoria_{campo}" + ("_total" if tipo == "counter" else "")
+        linhas.append(f"# TYPE {metrica} {tipo}")
+        linhas += [f'{metrica}{{funcao="{nome}"}} {valores[campo]}' for nome, valores in sorted(dados.items())]
+    return "\n".join(linhas) + "\n"
+
+def exportar_metricas(caminho=ARQUIVO_METRICAS):
+    """Grava metricas_prometheus() no arquivo (troca atômica); sem caminho configurado, não faz nada."""
+    if not caminho:
+        return None
+    try:
+        diretorio = os.path.dirname(os.path.abspath(caminho))
+        with tempfile.NamedTemporaryFile("w", dir=diretorio, suffix=".tmp", delete=False) as f:
+            f.write(metricas_prometheus())
+        os.replace(f.name, caminho)
+        return caminho
+    except OSError:
+        return None
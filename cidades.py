@@ -0,0 +1,103 @@
+import os
+import unicodedata
+import numpy as np
+
+# --- TABELA COMPACTA DE CIDADES (ASCENDENTE) ---
+# O dicionário do geonamescache (dezenas de milhares de cidades, cada uma um dict com vários
+# campos) só é lido uma vez, para gerar um arquivo colunar: nomes, países, coordenadas e
+# população em arrays numpy. Os apps carregam esse arquivo sob demanda (só quando o
+# Ascendente é pedido), uma única vez por processo, com dois índices:
+#   - hash (nome, país) -> linha, para achar as coordenadas da cidade escolhida;
+#   - chaves de busca ordenadas (minúsculas, sem acento), para o autocompletar por prefixo
+#     com busca binária.
+# Textos ficam em UTF-8 (1 byte por caractere ASCII, em vez de 4) e coordenadas em float32.
+# Sem o arquivo, ele é gerado na primeira consulta (precisa do geonamescache instalado).
+#
+# Uso: python cidades.py  (regera o arquivo)
+
+ARQUIVO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cidades.npz")
+MAX_SUGESTOES = 50
+
+def chave_busca(texto):
+    """Forma usada no índice de prefixo: minúsculas e sem acentos ("São Paulo" -> "sao paulo")."""
+    decomposto = unicodedata.normalize("NFKD", texto.strip().lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+def gerar_arquivo(caminho=ARQUIVO_PADRAO):
+    """Lê as cidades do geonamescache e grava a tabela colunar, ordenada pela chave de busca."""
+    import geonamescache
+    cidades = list(geonamescache.GeonamesCache().get_cities().values())
+    # Ordem do índice de prefixo; entre nomes iguais, a cidade mais populosa primeiro
+    cidades.sort(key=lambda c: (chave_busca(c["name"]), -int(c["population"] or 0), c["countrycode"]))
+    # A ordem dos bytes em UTF-8 é a mesma dos caracteres: a busca binária vale sobre os bytes
+    colunas = {
+        "nome": np.array([c["name"].encode() for c in cidades]),
+        "pais": np.array([c["countrycode"].encode() for c in cidades], dtype="S2"),
+        "chave": np.array([chave_busca(c["name"]).encode() for c in cidades]),
+        "lat": np.array([c["latitude"] for c in cidades], dtype="<f4"),
+        "lon": np.array([c["longitude"] for c in cidades], dtype="<f4"),
+        "populacao": np.array([int(c["population"] or 0) for c in cidades], dtype="<i4"),
+    }
+    # Grava num temporário e troca de uma vez: outro processo nunca vê o arquivo pela metade
+    temporario = caminho + ".tmp.npz"
+    np.savez_compressed(temporario, **colunas)
+    os.replace(temporario, caminho)
+    return caminho
+
+def abrir(caminho=ARQUIVO_PADRAO):
+    """Carrega a tabela e monta o índice (nome, país) -> linha; None se o arquivo não existir."""
+    if not os.path.exists(caminho):
+        return None
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        tabela = {campo: arquivo[campo] for campo in arquivo.files}
+    indice = {}
+    for linha, (nome, pais) in enumerate(zip(tabela["nome"].tolist(), tabela["pais"].tolist())):
+        nome, pais = nome.decode(), pais.decode()
+        # Homônimos no mesmo país: vale o primeiro, o mais populoso
+        indice.setdefault((nome, pais), linha)
+    tabela["indice"] = indice
+    return tabela
+
+_tabela_aberta = {}
+
+def tabela_padrao():
+    """Tabela do arquivo padrão, aberta (e gerada, se preciso) uma única vez por processo."""
+    if "tabela" not in _tabela_aberta:
+        if not os.path.exists(ARQUIVO_PADRAO):
+            gerar_arquivo()
+        _tabela_aberta["tabela"] = abrir()
+    return _tabela_aberta["tabela"]
+
+def rotulo(tabela, linha):
+    return f"{tabela['nome'][linha].decode()}, {tabela['pais'][linha].decode()}"
+
+def buscar(nome, pais, tabela=None):
+    """Dados da cidade pelo nome exato e código do país; None se não existir."""
+    tabela = tabela_padrao() if tabela is None else tabela
+    linha = tabela["indice"].get((nome.strip(), pais.strip().upper()))
+    if linha is None:
+        return None
+    return {"nome": tabela["nome"][linha].decode(), "pais": tabela["pais"][linha].decode(), "latitude": float(tabela["lat"][linha]),
+            "longitude": float(tabela["lon"][linha]), "populacao": int(tabela["populacao"][linha])}
+
+def buscar_rotulo(texto, tabela=None):
+    """Mesmo que buscar, a partir de "Nome, PAÍS" (o formato das sugestões)."""
+    nome, _, pais = texto.rpartition(",")
+    return buscar(nome, pais, tabela) if nome else None
+
+def sugestoes(prefixo, limite=MAX_SUGESTOES, tabela=None):
+    """Rótulos "Nome, PAÍS" das cidades cujo nome começa com o prefixo, das mais populosas às menores."""
+    tabela = tabela_padrao() if tabela is None else tabela
+    chave = chave_busca(prefixo).encode()
+    if not chave:
+        return []
+    # Faixa do prefixo nas chaves ordenadas: duas buscas binárias
+    ini = int(np.searchsorted(tabela["chave"], chave, side="left"))
+    fim = int(np.searchsorted(tabela["chave"], chave + b"\xff", side="left"))
+    linhas = ini + np.argsort(-tabela["populacao"][ini:fim], kind="stable")[:limite]
+    return [rotulo(tabela, linha) for linha in linhas]
+
+if __name__ == "__main__":
+    print(f"Gerando {ARQUIVO_PADRAO}...")
+    gerar_arquivo()
+    print("Concluído.")
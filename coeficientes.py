@@ -0,0 +1,163 @@
+import os
+import hashlib
+import swisseph as swe
+import numpy as np
+import efemerides as efe
+
+# --- ARMAZENAMENTO DE COEFICIENTES DE CHEBYSHEV (1900-2100) ---
+# A longitude de cada corpo é ajustada por um polinômio de Chebyshev em segmentos fixos
+# (curtos para a Lua, longos para os lentos) e os coeficientes ficam num único arquivo
+# binário, aberto com memmap. A consulta em qualquer vetor de JDs vira só conta com arrays,
+# sem uma chamada ao swisseph por ponto. Sem o arquivo, tudo cai de volta no swisseph.
+#
+# Formato: cabeçalho fixo, uma tabela com um registro por corpo e, em seguida, os blocos
+# de coeficientes (float64, [segmento x coeficiente]) de cada corpo.
+
+ARQUIVO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "efemerides_1900_2100.cheb")
+ANO_INICIO, ANO_FIM = 1900, 2100
+N_COEF = 14
+SEGMENTO_DIAS = {  # comprimento de cada segmento, em dias
+    swe.SUN: 16, swe.MOON: 4, swe.MERCURY: 8, swe.VENUS: 16, swe.MARS: 16,
+    swe.JUPITER: 32, swe.SATURN: 32, swe.URANUS: 64, swe.NEPTUNE: 64, swe.PLUTO: 64
+}
+
+MAGICO = b"CHEB0001"
+# Versão do swisseph que gerou os coeficientes, gravada no cabeçalho: arquivo de outra versão
+# não é usado (cai no swisseph) até ser regerado
+VERSAO = swe.version[:32]
+_CABECALHO = np.dtype([("magico", "S8"), ("jd_ini", "<f8"), ("jd_fim", "<f8"), ("flags", "<i8"), ("n_corpos", "<i8"), ("versao", "S32")])
+_REGISTRO = np.dtype([("id", "<i8"), ("dias", "<f8"), ("n_segmentos", "<i8"), ("n_coef", "<i8"), ("offset", "<i8")])
+
+def _nos(n_coef=N_COEF):
+    """Nós de Chebyshev (primeira espécie) em [-1, 1] e a matriz que leva os valores aos coeficientes."""
+    k = np.arange(n_coef) + 0.5
+    nos = np.cos(np.pi * k / n_coef)
+    transf = 2.0 / n_coef * np.cos(np.pi * np.outer(k, np.arange(n_coef)) / n_coef)
+    transf[:, 0] /= 2
+    return nos, transf
+
+def ajustar_corpo(id_corpo, jd_ini, jd_fim, dias, flags=efe.FLAGS_PADRAO, n_coef=N_COEF):
+    """Coeficientes [segmento x coeficiente] da longitude do corpo em segmentos de `dias` dias."""
+    n_seg = int(np.ceil((jd_fim - jd_ini) / dias))
+    nos, transf = _nos(n_coef)
+    meios = jd_ini + (np.arange(n_seg) + 0.5) * dias
+    jds = meios[:, None] + nos[None, :] * dias / 2
+    longs = efe.calcular_posicoes(jds.ravel(), [id_corpo], flags)["long"][:, 0].reshape(n_seg, n_coef)
+    # Longitude contínua dentro de cada segmento antes do ajuste
+    longs = np.rad2deg(np.unwrap(np.deg2rad(longs), axis=1))
+    return longs @ transf
+
+def gerar_arquivo(caminho=ARQUIVO_PADRAO, ids_corpos=None, ano_ini=ANO_INICIO, ano_fim=ANO_FIM, flags=efe.FLAGS_PADRAO):
+    """Ajusta todos os corpos no intervalo de anos e grava o arquivo de coeficientes."""
+    ids_corpos = list(SEGMENTO_DIAS) if ids_corpos is None else ids_corpos
+    jd_ini, jd_fim = swe.julday(ano_ini, 1, 1, 0.0), swe.julday(ano_fim + 1, 1, 1, 0.0)
+    blocos = [ajustar_corpo(id_corpo, jd_ini, jd_fim, SEGMENTO_DIAS[id_corpo], flags) for id_corpo in ids_corpos]
+
+    cabecalho = np.array([(MAGICO, jd_ini, jd_fim, flags, len(ids_corpos), VERSAO.encode())], dtype=_CABECALHO)
+    registros = np.zeros(len(ids_corpos), dtype=_REGISTRO)
+    offset = _CABECALHO.itemsize + registros.nbytes
+    for i, (id_corpo, bloco) in enumerate(zip(ids_corpos, blocos)):
+        registros[i] = (id_corpo, SEGMENTO_DIAS[id_corpo], bloco.shape[0], bloco.shape[1], offset)
+        offset += bloco.nbytes
+
+    with open(caminho, "wb") as f:
+        f.write(cabecalho.tobytes())
+        f.write(registros.tobytes())
+        for bloco in blocos:
+            f.write(np.ascontiguousarray(bloco, dtype="<f8").tobytes())
+    return caminho
+
+def abrir(caminho=ARQUIVO_PADRAO):
+    """Abre o arquivo de coeficientes com memmap; None se ele não existir."""
+    if not os.path.exists(caminho):
+        return None
+    cabecalho = np.fromfile(caminho, dtype=_CABECALHO, count=1)[0]
+    if cabecalho["magico"] != MAGICO:
+        return None
+    registros = np.fromfile(caminho, dtype=_REGISTRO, count=int(cabecalho["n_corpos"]), offset=_CABECALHO.itemsize)
+    corpos = {
+        int(r["id"]): {
+            "dias": float(r["dias"]),
+            "coef": np.memmap(caminho, dtype="<f8", mode="r", offset=int(r["offset"]), shape=(int(r["n_segmentos"]), int(r["n_coef"])))
+        }
+        for r in registros
+    }
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return {"jd_ini": float(cabecalho["jd_ini"]), "jd_fim": float(cabecalho["jd_fim"]), "flags": int(cabecalho["flags"]),
+            "versao": cabecalho["versao"].decode(), "sha256": h.hexdigest(), "corpos": corpos}
+
+_tabela_aberta = {}
+
+def tabela_padrao():
+    """Tabela do arquivo padrão, aberta uma única vez por processo."""
+    if "tabela" not in _tabela_aberta:
+        _tabela_aberta["tabela"] = abrir()
+    return _tabela_aberta["tabela"]
+
+def _clenshaw(coef, x):
+    """Avalia uma soma de Chebyshev por linha: coef [n x grau], x [n]."""
+    b1 = np.zeros_like(x)
+    b2 = np.zeros_like(x)
+    for j in range(coef.shape[1] - 1, 0, -1):
+        b1, b2 = 2 * x * b1 - b2 + coef[:, j], b1
+    return x * b1 - b2 + coef[:, 0]
+
+def avaliar(tabela, id_corpo, jds):
+    """Longitude (0-360°) e velocidade (°/dia) do corpo em jds, a partir dos coeficientes."""
+    corpo = tabela["corpos"][id_corpo]
+    jds = np.asarray(jds, dtype=float)
+    dias, coef = corpo["dias"], corpo["coef"]
+    seg = np.clip(((jds - tabela["jd_ini"]) // dias).astype(np.int64), 0, coef.shape[0] - 1)
+    x = 2 * (jds - tabela["jd_ini"] - seg * dias) / dias - 1
+    c = np.asarray(coef[seg])  # só os segmentos consultados saem do disco
+    longitude = _clenshaw(c, x) % 360
+    velocidade = _clenshaw(np.polynomial.chebyshev.chebder(c, axis=1), x) * 2 / dias
+    return longitude, velocidade
+
+def cobre(tabela, id_corpo, jds, flags=efe.FLAGS_PADRAO):
+    """Indica se a tabela atende o corpo em todo o vetor de JDs com as flags pedidas."""
+    if tabela is None or tabela["versao"] != VERSAO or id_corpo not in tabela["corpos"]:
+        return False
+    # FLG_SPEED não altera a longitude: a velocidade sai da derivada do polinômio
+    if (tabela["flags"] | swe.FLG_SPEED) != (flags | swe.FLG_SPEED):
+        return False
+    jds = np.asarray(jds, dtype=float)
+    return not len(jds) or (jds.min() >= tabela["jd_ini"] and jds.max() <= tabela["jd_fim"])
+
+def calcular_posicoes(jds, ids_corpos, flags=efe.FLAGS_PADRAO, tabela=None):
+    """Mesmo formato de efemerides.calcular_posicoes, servido pelos coeficientes quando possível."""
+    tabela = tabela_padrao() if tabela is None else tabela
+    faltantes = [id_corpo for id_corpo in ids_corpos if not cobre(tabela, id_corpo, jds, flags)]
+    pos = efe.calcular_posicoes(jds, faltantes, flags) if faltantes else None
+
+    jds = np.asarray(jds, dtype=float)
+    longitudes = np.empty((len(jds), len(ids_corpos)))
+    velocidades = np.empty((len(jds), len(ids_corpos)))
+    for j, id_corpo in enumerate(ids_corpos):
+        if id_corpo in faltantes:
+            longitudes[:, j] = pos["long"][:, faltantes.index(id_corpo)]
+            velocidades[:, j] = pos["vel"][:, faltantes.index(id_corpo)]
+        else:
+            longitudes[:, j], velocidades[:, j] = avaliar(tabela, id_corpo, jds)
+    return {"jd": jds, "long": longitudes, "vel": velocidades, "retro": velocidades < 0}
+
+def origem(jds, ids_corpos, flags=efe.FLAGS_PADRAO, tabela=None):
+    """De onde calcular_posicoes tira os corpos em jds: o arquivo (versão, faixa e sha256) ou "swisseph".
+
+    Entra na chave do cache em disco: regerar o arquivo ou cair no swisseph muda a chave.
+    """
+    tabela = tabela_padrao() if tabela is None else tabela
+    return [
+        f"cheb:{tabela['versao']}:{tabela['jd_ini']}-{tabela['jd_fim']}:{tabela['sha256']}" if cobre(tabela, id_corpo, jds, flags) else "swisseph"
+        for id_corpo in ids_corpos
+    ]
+
+calcular_posicoes.origem = origem
+
+if __name__ == "__main__":
+    print(f"Gerando {ARQUIVO_PADRAO} ({ANO_INICIO}-{ANO_FIM})...")
+    gerar_arquivo()
+    print("Concluído.")
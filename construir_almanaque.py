@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import argparse
+import tempfile
+from multiprocessing import Pool
+import swisseph as swe
+import numpy as np
+import efemerides as efe
+import eventos as ev
+import coeficientes as coef
+
+# --- CONSTRUTOR DO ALMANAQUE ---
+# Pré-calcula, para uma faixa de anos, as séries de posições, as estações e os ingressos
+# de cada corpo. Roda no deploy para que nenhum acesso dos apps pague o cálculo a frio:
+# as séries passam pelo cache em disco (cache_disco) com as mesmas chaves usadas pelos apps.
+#
+# Cada tarefa (um ano x um grupo de corpos) vira um .npz gravado de forma atômica; o
+# manifesto guarda o sha256 de cada arquivo. Ao rodar de novo, tarefas cujo arquivo
+# confere com o manifesto são puladas, então uma execução interrompida continua de onde parou.
+#
+# Os apps leem as séries do ano direto daqui (tarefas.series_periodo) quando o manifesto tem
+# o ano e os corpos pedidos; o resto é calculado como sempre.
+#
+# Uso: python construir_almanaque.py --inicio 1900 --fim 2100 --processos 8
+
+CORPOS = [swe.SUN, swe.MOON, swe.MERCURY, swe.VENUS, swe.MARS, swe.JUPITER, swe.SATURN, swe.URANUS, swe.NEPTUNE, swe.PLUTO]
+MANIFESTO = "manifesto.json"
+DIRETORIO_PADRAO = os.environ.get("EFEMERIDES_ALMANAQUE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "almanaque"))
+
+def sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def gravar_atomico(caminho, escrever):
+    """Escreve num temporário do mesmo diretório e troca de uma vez (os.replace)."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(caminho), suffix=".tmp", delete=False) as f:
+        escrever(f)
+    os.replace(f.name, caminho)
+
+def nome_tarefa(ano, ids_corpos):
+    return os.path.join(str(ano), "corpos_" + "_".join(str(i) for i in ids_corpos) + ".npz")
+
+def ler_nome_tarefa(arquivo):
+    """(ano, ids dos corpos) de um arquivo do manifesto; None para o que não é tarefa."""
+    pasta, nome = os.path.split(arquivo)
+    if not (pasta.isdigit() and nome.startswith("corpos_") and nome.endswith(".npz")):
+        return None
+    return int(pasta), [int(i) for i in nome[len("corpos_"):-len(".npz")].split("_")]
+
+def processar_tarefa(tarefa):
+    """Séries, estações e ingressos de um grupo de corpos em um ano; devolve (arquivo, sha256)."""
+    ano, ids_corpos, saida = tarefa
+    tabelas = {"ids": np.array(ids_corpos)}
+    # Mesmos parâmetros e blocos mensais dos apps, para que as chaves do cache em disco coincidam;
+    # aqui, fora dos pedidos, o erro é conferido em todos os intervalos
+    series = efe.calcular_series_em_blocos(efe.blocos_periodo(ano), ids_corpos, verificar="completa", fonte=coef.calcular_posicoes)
+
+    for id_corpo in ids_corpos:
+        serie = series[id_corpo]
+        estacoes = ev.estacoes(serie["jd"], serie["vel"], id_corpo)
+        ingressos = ev.ingressos(serie["jd"], serie["long"], id_corpo)
+        tabelas[f"posicoes_{id_corpo}"] = np.vstack([serie["jd"], serie["long"], serie["vel"]])
+        # Passo nativo e erro estimado: o que falta para a série voltar inteira (tarefas.series_periodo)
+        tabelas[f"passo_{id_corpo}"] = np.array(serie["passo"])
+        tabelas[f"erro_{id_corpo}"] = np.array(serie["erro"])
+        # [jd, longitude, +1 direta / -1 retrógrada] e [jd, signo de chegada, +1 avanço / -1 recuo]
+        tabelas[f"estacoes_{id_corpo}"] = np.array([[e["jd"], e["long"], -1 if e["tipo"] == "R" else 1] for e in estacoes]).reshape(-1, 3)
+        tabelas[f"ingressos_{id_corpo}"] = np.array([[i["jd"], i["signo"], i["direcao"]] for i in ingressos]).reshape(-1, 3)
+
+    arquivo = nome_tarefa(ano, ids_corpos)
+    caminho = os.path.join(saida, arquivo)
+    gravar_atomico(caminho, lambda f: np.savez(f, **tabelas))
+    return arquivo, sha256_arquivo(caminho)
+
+def carregar_manifesto(saida):
+    try:
+        with open(os.path.join(saida, MANIFESTO)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def gravar_manifesto(saida, manifesto):
+    gravar_atomico(os.path.join(saida, MANIFESTO), lambda f: f.write(json.dumps(manifesto, indent=1, sort_keys=True).encode()))
+
+def tarefa_concluida(saida, arquivo, manifesto):
+    caminho = os.path.join(saida, arquivo)
+    return arquivo in manifesto and os.path.exists(caminho) and sha256_arquivo(caminho) == manifesto[arquivo]
+
+def construir(ano_ini, ano_fim, saida, processos=None, corpos_por_tarefa=5, gerar_coeficientes=False):
+    os.makedirs(saida, exist_ok=True)
+    if gerar_coeficientes or not os.path.exists(coef.ARQUIVO_PADRAO):
+        print(f"Gerando coeficientes de Chebyshev em {coef.ARQUIVO_PADRAO}...")
+        coef.gerar_arquivo()
+
+    manifesto = carregar_manifesto(saida)
+    if manifesto.get("_versao_swe") != swe.version:
+        # Outra versão do swisseph: nada do que foi gravado antes vale
+        manifesto = {"_versao_swe": swe.version}
+    grupos = [CORPOS[i:i + corpos_por_tarefa] for i in range(0, len(CORPOS), corpos_por_tarefa)]
+    tarefas = [(ano, grupo, saida) for ano in range(ano_ini, ano_fim + 1) for grupo in grupos]
+    pendentes = [t for t in tarefas if not tarefa_concluida(saida, nome_tarefa(t[0], t[1]), manifesto)]
+    print(f"{len(tarefas) - len(pendentes)} de {len(tarefas)} tarefas já concluídas.")
+
+    with Pool(processos) as pool:
+        for n, (arquivo, checksum) in enumerate(pool.imap_unordered(processar_tarefa, pendentes), 1):
+            # O manifesto é regravado a cada tarefa: uma interrupção perde no máximo o que estava em curso
+            manifesto[arquivo] = checksum
+            gravar_manifesto(saida, manifesto)
+            print(f"[{n}/{len(pendentes)}] {arquivo}")
+    print("Concluído.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-calcula posições, estações e ingressos para uma faixa de anos.")
+    parser.add_argument("--inicio", type=int, default=coef.ANO_INICIO)
+    parser.add_argument("--fim", type=int, default=coef.ANO_FIM)
+    parser.add_argument("--saida", default=DIRETORIO_PADRAO)
+    parser.add_argument("--processos", type=int, default=None, help="Padrão: número de CPUs")
+    parser.add_argument("--corpos-por-tarefa", type=int, default=5)
+    parser.add_argument("--coeficientes", action="store_true", help="Regera o arquivo de coeficientes de Chebyshev")
+    args = parser.parse_args()
+    construir(args.inicio, args.fim, args.saida, args.processos, args.corpos_por_tarefa, args.coeficientes)
@@ -0,0 +1,426 @@
+import os
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import swisseph as swe
+import numpy as np
+import pandas as pd
+import cache_disco as cd
+
+# --- MOTOR DE EFEMÉRIDES COMPARTILHADO ---
+# Usado por app.py, app_todos_planetas_ano.py e pelos scripts grafico_todos_aspectos_*.
+# Recebe uma grade de Julian Days e uma lista de corpos e devolve arrays densos
+# (tempo x corpo) em vez de montar um dicionário por linha.
+
+FLAGS_PADRAO = swe.FLG_SWIEPH | swe.FLG_SPEED
+
+ORBE_PADRAO = 5.0
+SIGMA_INTENSIDADE = 1.7
+
+def limites_periodo(ano, mes=None):
+    """Julian Days de início e fim do ano inteiro (ou de um único mês, se informado)."""
+    jd_start = swe.julday(ano, mes if mes else 1, 1)
+    # Fim no dia 1º seguinte: janeiro do ano seguinte para o ano inteiro ou para dezembro
+    jd_end = swe.julday(ano + (1 if not mes or mes == 12 else 0), mes + 1 if mes and mes < 12 else 1, 1)
+    return jd_start, jd_end
+
+def grade_jd(ano, mes=None, passo=0.05):
+    """Grade de Julian Days do ano inteiro (ou de um único mês, se informado)."""
+    return np.arange(*limites_periodo(ano, mes), passo)
+
+# Passo (dias) do eixo dos gráficos: o fino e o da prévia grossa (primeira pintura)
+PASSO_GRAFICO = {"ano": 0.05, "mes": 0.005}
+PASSO_PREVIA = {"ano": 1.0, "mes": 0.05}
+
+def passo_grafico(mes=None, previa=False):
+    """Passo do eixo do gráfico do ano inteiro (ou do mês da Lua), fino ou da prévia."""
+    return (PASSO_PREVIA if previa else PASSO_GRAFICO)["mes" if mes else "ano"]
+
+def calcular_posicoes(jds, ids_corpos, flags=FLAGS_PADRAO):
+    """Calcula longitude, velocidade e flag de retrogradação de todos os corpos em uma passada."""
+    jds = np.asarray(jds, dtype=float)
+    longitudes = np.empty((len(jds), len(ids_corpos)))
+    velocidades = np.empty((len(jds), len(ids_corpos)))
+
+    calc_ut = swe.calc_ut
+    for j, id_corpo in enumerate(ids_corpos):
+        # Apenas longitude (0) e velocidade em longitude (3) interessam aqui
+        res = [calc_ut(jd, id_corpo, flags)[0] for jd in jds]
+        if res:
+            res = np.array(res)
+            longitudes[:, j] = res[:, 0]
+            velocidades[:, j] = res[:, 3]
+
+    return {"jd": jds, "long": longitudes, "vel": velocidades, "retro": velocidades < 0}
+
+def _origem_swisseph(jds, ids_corpos, flags=FLAGS_PADRAO):
+    # Identificação dos dados de calcular_posicoes para a chave do cache (ver _serie_corpo)
+    return ["swisseph"] * len(ids_corpos)
+
+calcular_posicoes.origem = _origem_swisseph
+
+# --- EXECUÇÃO EM PROCESSOS ---
+# Trabalho pesado (séries por corpo, eventos por alvo x corpo) pode ser espalhado num
+# ProcessPoolExecutor: cada processo tem o seu próprio estado do swisseph e os resultados
+# voltam na ordem das tarefas, idênticos bit a bit aos da execução em série.
+# O pool é um só por processo, criado na primeira chamada e reaproveitado (as séries passam
+# por aqui bloco a bloco). Dentro de um processo filho (pool da fila_calculo, Pool do
+# construir_almanaque) tudo roda em série: nada de pools aninhados.
+PROCESSOS_PADRAO = int(os.environ.get("EFEMERIDES_PROCESSOS", "1"))
+
+_trava_pool = threading.Lock()
+_pool_mapear = {"executor": None, "processos": 0}
+
+def _chamar(tarefa):
+    funcao, args, kwargs = tarefa
+    return funcao(*args, **kwargs)
+
+def _executor(processos):
+    with _trava_pool:
+        if _pool_mapear["executor"] is None or _pool_mapear["processos"] < processos:
+            if _pool_mapear["executor"] is not None:
+                _pool_mapear["executor"].shutdown(wait=False)
+            _pool_mapear["executor"] = ProcessPoolExecutor(max_workers=processos)
+            _pool_mapear["processos"] = processos
+        return _pool_mapear["executor"]
+
+def _descartar_executor(executor):
+    with _trava_pool:
+        if _pool_mapear["executor"] is executor:
+            _pool_mapear["executor"], _pool_mapear["processos"] = None, 0
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def mapear(funcao, lista_args, processos=None, **kwargs):
+    """[funcao(*args, **kwargs) para cada args], em ordem; em paralelo quando processos > 1.
+
+    Sem processos filhos disponíveis (ambiente restrito, pool quebrado) ou já dentro de um
+    processo filho, cai para a execução em série. O padrão vem de EFEMERIDES_PROCESSOS (1 = série).
+    """
+    processos = PROCESSOS_PADRAO if processos is None else processos
+    if processos > 1 and len(lista_args) > 1 and mp.parent_process() is None:
+        executor = None
+        try:
+            executor = _executor(processos)
+            tarefas = [(funcao, args, kwargs) for args in lista_args]
+            return list(executor.map(_chamar, tarefas, chunksize=max(len(tarefas) // (4 * processos), 1)))
+        except BrokenProcessPool:
+            # Um processo morreu: o próximo pedido cria outro pool
+            _descartar_executor(executor)
+        except (OSError, NotImplementedError):
+            pass
+    return [funcao(*args, **kwargs) for args in lista_args]
+
+# --- MODO HERMITE E PASSO POR CORPO ---
+# Cada calc_ut já devolve longitude e velocidade, o que basta para uma interpolação
+# cúbica de Hermite. Cada corpo é amostrado no seu passo nativo (derivado da velocidade
+# máxima e de uma resolução angular alvo) e só é levado à grade do gráfico quando preciso.
+VELOCIDADE_MAXIMA = {  # °/dia, com folga
+    swe.SUN: 1.02, swe.MOON: 15.4, swe.MERCURY: 2.2, swe.VENUS: 1.26, swe.MARS: 0.8,
+    swe.JUPITER: 0.25, swe.SATURN: 0.13, swe.URANUS: 0.07, swe.NEPTUNE: 0.04, swe.PLUTO: 0.04
+}
+RESOLUCAO_PADRAO = 2.0  # graus percorridos, no máximo, entre duas amostras
+RESOLUCAO_PREVIA = 10.0  # a da prévia grossa: o período inteiro em poucas centenas de amostras
+# Frações de cada intervalo de amostragem em que a interpolação é conferida: o erro de Hermite
+# não tem o máximo sempre no meio (a derivada quarta varia dentro do intervalo), e nos nós
+# sobra o erro da própria fonte (ex.: o ajuste de Chebyshev)
+FRACOES_VERIFICACAO = (0, 1/6, 1/3, 1/2, 2/3, 5/6)
+# Intervalos conferidos por série no caminho dos pedidos (verificar=True): os de maior erro
+# previsto. A conferência de todos (verificar="completa") fica para o construir_almanaque
+INTERVALOS_VERIFICADOS = 2
+PASSO_MINIMO, PASSO_MAXIMO = 0.005, 5.0
+
+def passo_do_corpo(id_corpo, resolucao=RESOLUCAO_PADRAO):
+    """Passo de amostragem (dias) para que o corpo não ande mais que a resolução entre amostras."""
+    return float(np.clip(resolucao / VELOCIDADE_MAXIMA.get(id_corpo, 1.0), PASSO_MINIMO, PASSO_MAXIMO))
+
+def calcular_series(jd_ini, jd_fim, ids_corpos, flags=FLAGS_PADRAO, resolucao=RESOLUCAO_PADRAO, passos=None, verificar=False, fonte=None, em_disco=True, processos=None):
+    """Série de cada corpo no seu passo nativo cobrindo [jd_ini, jd_fim], indexada pelo id do corpo.
+
+    `fonte` troca o cálculo das amostras (por exemplo, coeficientes.calcular_posicoes); o padrão
+    é calcular_posicoes, direto no swisseph. Com verificar cada série traz "erro": o maior
+    desvio (em graus) entre a interpolação e o swisseph (sempre calcular_posicoes, qualquer que
+    seja a fonte), medido em vários pontos de cada intervalo conferido (FRACOES_VERIFICACAO):
+    todos com verificar="completa", só os de maior erro previsto com verificar=True (ver
+    intervalos_verificados). Com em_disco=True as amostras e o erro
+    passam pelo cache em disco (cache_disco) e voltam como arrays somente leitura; se a fonte
+    tiver o atributo `origem` (jds, ids, flags -> identificação por corpo), ele entra na chave.
+    Com processos > 1 os corpos são distribuídos entre processos (ver mapear).
+    """
+    fonte = fonte or calcular_posicoes
+    tarefas = [(id_corpo, jd_ini, jd_fim, (passos or {}).get(id_corpo) or passo_do_corpo(id_corpo, resolucao)) for id_corpo in ids_corpos]
+    series = mapear(_serie_corpo, tarefas, processos, flags=flags, verificar=verificar, fonte=fonte, em_disco=em_disco)
+    return dict(zip(ids_corpos, series))
+
+def _serie_corpo(id_corpo, jd_ini, jd_fim, passo, flags, verificar, fonte, em_disco):
+    n = max(int(np.ceil((jd_fim - jd_ini) / passo)), 1)
+    partes = {"jd_ini": jd_ini, "jd_fim": jd_fim, "n": n, "id": id_corpo, "flags": flags,
+              "fonte": f"{fonte.__module__}.{fonte.__name__}"}
+    # Quem de fato serve os dados (ex.: qual arquivo de coeficientes, ou o swisseph na falta dele)
+    partes["origem"] = fonte.origem([jd_ini, jd_fim], [id_corpo], flags)[0] if hasattr(fonte, "origem") else None
+
+    def amostrar():
+        amostra = np.linspace(jd_ini, jd_fim, n + 1)
+        pos = fonte(amostra, [id_corpo], flags)
+        return np.vstack([amostra, pos["long"][:, 0], pos["vel"][:, 0]])
+
+    dados = cd.obter(dict(partes, campo="amostras"), amostrar) if em_disco else amostrar()
+    serie = {"jd": dados[0], "long": dados[1], "vel": dados[2], "passo": dados[0][1] - dados[0][0]}
+
+    if verificar:
+        def medir_erro():
+            # Contra o swisseph, não contra a fonte: o erro da fonte (ex.: Chebyshev) entra na conta
+            k = intervalos_verificados(serie["vel"], None if verificar == "completa" else INTERVALOS_VERIFICADOS)
+            pontos = (serie["jd"][k, None] + np.multiply.outer(np.diff(serie["jd"])[k], FRACOES_VERIFICACAO)).ravel()
+            direto = calcular_posicoes(pontos, [id_corpo], flags)["long"][:, 0]
+            interp, _ = interpolar_hermite(serie["jd"], serie["long"], serie["vel"], pontos)
+            return [np.max(np.abs(((interp - direto + 180) % 360) - 180))]
+
+        chave_erro = dict(partes, campo="erro", verificacao="swisseph", fracoes=list(FRACOES_VERIFICACAO),
+                          intervalos="todos" if verificar == "completa" else INTERVALOS_VERIFICADOS)
+        serie["erro"] = float((cd.obter(chave_erro, medir_erro) if em_disco else medir_erro())[0])
+    return serie
+
+def intervalos_verificados(velocidades, limite=None):
+    """Índices dos intervalos de amostragem a conferir: todos, ou os `limite` de maior erro previsto.
+
+    O erro do Hermite cúbico cresce com a derivada quarta da longitude, que sai (sem chamar o
+    swisseph) da terceira diferença das velocidades nas amostras vizinhas.
+    """
+    n = len(velocidades) - 1
+    if limite is None or n <= limite:
+        return np.arange(n)
+    previsto = np.zeros(n)
+    previsto[1:n - 1] = np.abs(np.diff(velocidades, 3))
+    previsto[0], previsto[-1] = previsto[1], previsto[-2]
+    return np.sort(np.argsort(-previsto, kind="stable")[:limite])
+
+def interpolar_hermite(jds_amostra, longitudes, velocidades, jds):
+    """Reconstrói longitude e velocidade em jds a partir das amostras (Hermite cúbico)."""
+    jds_amostra = np.asarray(jds_amostra, dtype=float)
+    jds = np.asarray(jds, dtype=float)
+    # Longitude contínua (sem o salto de 360° para 0°) para interpolar
+    longs = np.rad2deg(np.unwrap(np.deg2rad(longitudes)))
+    vels = np.asarray(velocidades)
+
+    i = np.clip(np.searchsorted(jds_amostra, jds, side='right') - 1, 0, len(jds_amostra) - 2)
+    h = jds_amostra[i + 1] - jds_amostra[i]
+    s = (jds - jds_amostra[i]) / h
+    p0, p1, m0, m1 = longs[i], longs[i + 1], vels[i] * h, vels[i + 1] * h
+
+    s2, s3 = s * s, s * s * s
+    longitude = (2*s3 - 3*s2 + 1) * p0 + (s3 - 2*s2 + s) * m0 + (-2*s3 + 3*s2) * p1 + (s3 - s2) * m1
+    velocidade = ((6*s2 - 6*s) * p0 + (3*s2 - 4*s + 1) * m0 + (-6*s2 + 6*s) * p1 + (3*s2 - 2*s) * m1) / h
+    return longitude % 360, velocidade
+
+def reamostrar(series, ids_corpos, jds):
+    """Leva as séries nativas de cada corpo para a grade jds, no formato de calcular_posicoes."""
+    jds = np.asarray(jds, dtype=float)
+    longitudes = np.empty((len(jds), len(ids_corpos)))
+    velocidades = np.empty((len(jds), len(ids_corpos)))
+    for j, id_corpo in enumerate(ids_corpos):
+        serie = series[id_corpo]
+        longitudes[:, j], velocidades[:, j] = interpolar_hermite(serie["jd"], serie["long"], serie["vel"], jds)
+    return {"jd": jds, "long": longitudes, "vel": velocidades, "retro": velocidades < 0}
+
+def calcular_posicoes_hermite(jds, ids_corpos, flags=FLAGS_PADRAO, resolucao=RESOLUCAO_PADRAO, passos=None, processos=None):
+    """Mesmo resultado de calcular_posicoes, amostrando cada corpo só no seu passo nativo.
+
+    Inclui "erro": o erro estimado de interpolação (em graus) de cada corpo.
+    """
+    jds = np.asarray(jds, dtype=float)
+    if not len(jds):
+        pos = calcular_posicoes(jds, ids_corpos, flags)
+        pos["erro"] = np.zeros(len(ids_corpos))
+        return pos
+    series = calcular_series(jds[0], jds[-1], ids_corpos, flags, resolucao, passos, verificar=True, processos=processos)
+    pos = reamostrar(series, ids_corpos, jds)
+    pos["erro"] = np.array([series[id_corpo]["erro"] for id_corpo in ids_corpos])
+    return pos
+
+# --- CÁLCULO EM BLOCOS (CANCELÁVEL) ---
+# Períodos longos são calculados um mês por vez. Entre um bloco e outro o cancelamento é
+# conferido e o progresso é informado: um pedido abandonado para em no máximo um bloco.
+# O cancelamento é qualquer objeto com is_set() (ex.: threading.Event); no Streamlit, a
+# própria atualização da barra de progresso interrompe a execução obsoleta (rerun).
+
+class CalculoCancelado(Exception):
+    """Levantada entre dois blocos quando o cancelamento foi pedido."""
+
+def blocos_periodo(ano, mes=None):
+    """Intervalos (jd_ini, jd_fim) de cada mês do ano (ou só do mês informado)."""
+    return [limites_periodo(ano, m) for m in ([mes] if mes else range(1, 13))]
+
+def processar_em_blocos(funcao, blocos, cancelamento=None, progresso=None):
+    """[funcao(*bloco) para cada bloco], em ordem, conferindo o cancelamento antes de cada bloco.
+
+    `progresso`, se informado, é chamado com a fração concluída (0 a 1) após cada bloco.
+    """
+    resultados = []
+    for i, bloco in enumerate(blocos):
+        if cancelamento is not None and cancelamento.is_set():
+            raise CalculoCancelado(f"cancelado após {i} de {len(blocos)} blocos")
+        resultados.append(funcao(*bloco))
+        if progresso is not None:
+            progresso((i + 1) / len(blocos))
+    return resultados
+
+def juntar_series(partes, ids_corpos):
+    """Uma série por corpo a partir das séries de blocos consecutivos (o ponto de emenda entra uma vez)."""
+    series = {}
+    for id_corpo in ids_corpos:
+        pedacos = [parte[id_corpo] for parte in partes]
+        serie = {campo: np.concatenate([pedacos[0][campo]] + [p[campo][1:] for p in pedacos[1:]]) for campo in ("jd", "long", "vel")}
+        serie["passo"] = max(p["passo"] for p in pedacos)
+        if all("erro" in p for p in pedacos):
+            serie["erro"] = max(p["erro"] for p in pedacos)
+        series[id_corpo] = serie
+    return series
+
+def calcular_series_em_blocos(blocos, ids_corpos, flags=FLAGS_PADRAO, resolucao=RESOLUCAO_PADRAO, passos=None, verificar=False, fonte=None, em_disco=True, processos=None, cancelamento=None, progresso=None):
+    """calcular_series bloco a bloco (ver blocos_periodo), com cancelamento e progresso entre blocos.
+
+    Cada bloco tem a sua entrada no cache em disco: o ano inteiro e o mês avulso usam as mesmas.
+    """
+    partes = processar_em_blocos(
+        lambda jd_ini, jd_fim: calcular_series(jd_ini, jd_fim, ids_corpos, flags, resolucao, passos, verificar, fonte, em_disco, processos),
+        blocos, cancelamento, progresso)
+    return juntar_series(partes, ids_corpos)
+
+# --- CONVERSÃO DE DATAS (VETORIZADA) ---
+# O Julian Day (UT) é contado em dias contínuos; o eixo de datas sai direto como
+# datetime64[ns], sem revjul nem datetime por ponto e sem coluna de objetos no pandas.
+JD_EPOCA_UNIX = 2440587.5  # 1970-01-01 00:00 UT
+
+def jd_para_datetime64(jds):
+    """Converte Julian Days (UT) em datetime64[ns], arredondados ao minuto."""
+    minutos = np.rint((np.asarray(jds, dtype=float) - JD_EPOCA_UNIX) * 1440).astype(np.int64)
+    return minutos.astype("datetime64[m]").astype("datetime64[ns]")
+
+def jd_para_datetime(jd):
+    """Converte um Julian Day (UT) em datetime (precisão de minuto)."""
+    return jd_para_datetime64(jd).astype("datetime64[us]").item()
+
+def formatar_jd(jd, formato='%d/%m/%Y %H:%M'):
+    """Formata um Julian Day (UT); vazio quando o instante não existe."""
+    return jd_para_datetime(jd).strftime(formato) if jd is not None else ""
+
+def datas_do_grid(jds):
+    """Eixo de datas (datetime64[ns]) da grade de Julian Days, pronto para o pandas e o Plotly."""
+    return jd_para_datetime64(jds)
+
+# --- GRANDEZAS DERIVADAS (VETORIZADAS) ---
+def distancia_no_signo(longitudes, grau_natal):
+    """Distância (0 a 15°) entre a posição no signo e o grau natal, com volta nos 30°."""
+    pos = np.asarray(longitudes) % 30
+    return np.abs(((pos - grau_natal + 15) % 30) - 15)
+
+def intensidade(dist, orbe=ORBE_PADRAO):
+    """Curva gaussiana de intensidade; NaN fora do orbe."""
+    dist = np.asarray(dist, dtype=float)
+    return np.where(dist <= orbe, np.exp(-0.5 * (dist / SIGMA_INTENSIDADE)**2), np.nan)
+
+def distancia_para_intensidade(limiar):
+    """Distância ao grau natal em que a curva de intensidade atinge o limiar."""
+    return SIGMA_INTENSIDADE * np.sqrt(-2 * np.log(limiar))
+
+def separacao_angular(long1, long2):
+    """Menor distância angular (0 a 180°) entre duas longitudes."""
+    diff = np.abs(np.asarray(long1) - long2) % 360
+    return np.where(diff > 180, 360 - diff, diff)
+
+def codigo_aspecto(long1, long2, orbe=ORBE_PADRAO):
+    """Índice do aspecto (ângulo / 30, de 0 a 6) dentro do orbe, ou -1 se não houver aspecto."""
+    sep = separacao_angular(long1, long2)
+    k = np.rint(sep / 30)
+    return np.where(np.abs(sep - 30 * k) <= orbe, k, -1).astype(np.int8)
+
+# --- TABELA COMPACTA DE TRÂNSITOS ---
+# A intensidade é zero/NaN na maior parte do ano: a tabela guarda só as amostras dentro do
+# orbe (uma linha por corpo e instante, com o índice na grade) num esquema fixo e enxuto,
+# que é o que vai para o st.cache_data e para os gráficos.
+ESQUEMA_TRANSITOS = {
+    "corpo": "category",
+    "indice": "int32",
+    "intensidade": "float32",
+    "long": "float32",
+    "retro": "bool",
+    "signo": pd.CategoricalDtype(range(12)),
+    "aspecto": pd.CategoricalDtype(range(-1, 7)),
+}
+
+def aplicar_esquema(tabela):
+    """Impõe o esquema compacto (ESQUEMA_TRANSITOS) às colunas da tabela."""
+    return tabela.astype(ESQUEMA_TRANSITOS)[list(ESQUEMA_TRANSITOS)]
+
+def tabela_transitos(intensidades, longitudes, retro, aspectos, nomes_corpos, inicio=0):
+    """Tabela das amostras dentro do orbe a partir dos arrays [tempo x corpo].
+
+    `inicio` é a posição do primeiro instante na grade completa (tabelas feitas por trechos).
+    """
+    t, j = np.nonzero(np.nan_to_num(np.asarray(intensidades, dtype=float)) > 0)
+    longs = np.asarray(longitudes)[t, j]
+    return aplicar_esquema(pd.DataFrame({
+        "corpo": pd.Categorical.from_codes(j, categories=nomes_corpos),
+        "indice": t + inicio,
+        "intensidade": np.asarray(intensidades)[t, j],
+        "long": longs,
+        "retro": np.asarray(retro)[t, j],
+        "signo": (longs // 30).astype(int) % 12,
+        "aspecto": np.asarray(aspectos)[t, j],
+    }))
+
+def juntar_tabelas(partes):
+    """Uma tabela de trânsitos a partir das tabelas de trechos consecutivos da mesma grade."""
+    return aplicar_esquema(pd.concat(partes, ignore_index=True))
+
+def bytes_por_linha(tabela):
+    """Memória da tabela (com índice) dividida pelo número de linhas."""
+    return tabela.memory_usage(deep=True).sum() / max(len(tabela), 1)
+
+# --- RÓTULOS DE HOVER ---
+# Em vez de uma string por amostra, a curva de cada corpo é dividida em trechos contíguos com
+# signo, direção e aspecto constantes: cada trecho tem o seu hovertemplate fixo e só graus e
+# minutos (da posição e do orbe) viajam como customdata numérico.
+def graus_minutos(valores):
+    """Parte inteira dos graus e minutos (truncados) de cada valor, como int16."""
+    valores = np.asarray(valores, dtype=float)
+    return np.floor(valores).astype(np.int16), np.floor((valores % 1) * 60).astype(np.int16)
+
+def trechos_hover(tabela_corpo, grau_natal, nomes_signo, simbolos_aspecto):
+    """Trechos prontos para o gráfico a partir das linhas de um corpo na tabela de trânsitos.
+
+    Cada trecho traz "fatia" (na grade completa), "intensidade", "customdata" [n x 4] (grau,
+    minuto, grau do orbe, minuto do orbe) e "hovertemplate"; sempre há ao menos um (vazio
+    quando a curva não entra no orbe), para que o corpo continue aparecendo na legenda.
+    """
+    indices = tabela_corpo["indice"].to_numpy()
+    longs = tabela_corpo["long"].to_numpy(dtype=float)
+    signos = tabela_corpo["signo"].to_numpy(dtype=np.int8)
+    retro = tabela_corpo["retro"].to_numpy()
+    codigos = tabela_corpo["aspecto"].to_numpy(dtype=np.int8)
+    intensidades = tabela_corpo["intensidade"].to_numpy()
+    customdata = np.column_stack(graus_minutos(longs % 30) + graus_minutos(distancia_no_signo(longs, grau_natal)))
+
+    chave = np.column_stack([signos, retro, codigos])
+    quebra = (np.diff(indices) != 1) | np.any(chave[1:] != chave[:-1], axis=1)
+    inicios = np.concatenate([[0], np.flatnonzero(quebra) + 1]) if len(indices) else np.array([], dtype=int)
+    trechos = [
+        {"fatia": slice(indices[i0], indices[i1 - 1] + 1),
+         "intensidade": intensidades[i0:i1],
+         "customdata": customdata[i0:i1],
+         "hovertemplate": f"<b>{nomes_signo[signos[i0]]} {'(R)' if retro[i0] else '(D)'} %{{customdata[0]:02d}}°%{{customdata[1]:02d}}' "
+                          f"- orbe %{{customdata[2]}}°%{{customdata[3]:02d}}' {simbolos_aspecto[codigos[i0]]}</b><extra></extra>"}
+        for i0, i1 in zip(inicios, np.append(inicios[1:], len(indices)))
+    ]
+    return trechos or [{"fatia": slice(0, 0), "intensidade": np.empty(0), "customdata": np.empty((0, 4), np.int16), "hovertemplate": ""}]
+
+def matriz_alvos(longitudes, longs_natais, orbe=ORBE_PADRAO):
+    """Cruza as longitudes em trânsito (tempo x corpo) com todas as longitudes natais de uma vez.
+
+    Devolve distância no signo, intensidade e código de aspecto como arrays [tempo x corpo x alvo].
+    """
+    longs = np.asarray(longitudes)[:, :, None]
+    natais = np.asarray(longs_natais, dtype=float)[None, None, :]
+    dist = distancia_no_signo(longs, natais % 30)
+    return {"dist": dist, "intensidade": intensidade(dist, orbe), "aspecto": codigo_aspecto(longs, natais, orbe)}
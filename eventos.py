@@ -0,0 +1,238 @@
+import swisseph as swe
+import numpy as np
+import efemerides as efe
+
+# --- SOLUCIONADOR DE EVENTOS EXATOS ---
+# A grade de amostragem serve só para isolar (bracket) os eventos; o instante exato
+# é refinado com o swisseph, usando a velocidade (FLG_SPEED) como derivada.
+# Para que o isolamento funcione, o passo da grade deve manter o deslocamento
+# de cada corpo bem abaixo de 15° por passo.
+
+TOL_JD = 1e-5  # ~1 segundo
+
+def offset_no_signo(longitudes, grau_natal):
+    """Distância com sinal (-15 a 15°) entre a posição no signo e o grau natal."""
+    return ((np.asarray(longitudes) - grau_natal + 15) % 30) - 15
+
+def resolver_raiz(func, a, b, tol=TOL_JD, max_iter=60):
+    """Newton protegido por bissecção em [a, b]; func(jd) devolve (valor, derivada)."""
+    fa, _ = func(a)
+    fb, _ = func(b)
+    if fa == 0: return a
+    if fb == 0: return b
+    if (fa > 0) == (fb > 0):
+        # Sem troca de sinal: devolve a ponta mais próxima da raiz
+        return a if abs(fa) < abs(fb) else b
+
+    # Orienta o intervalo para que func(lo) < 0 < func(hi)
+    lo, hi = (a, b) if fa < 0 else (b, a)
+    t = 0.5 * (a + b)
+    dx_ant = dx = abs(b - a)
+    f, df = func(t)
+    for _ in range(max_iter):
+        if ((t - hi) * df - f) * ((t - lo) * df - f) > 0 or abs(2 * f) > abs(dx_ant * df):
+            # Newton sairia do intervalo ou convergiria devagar: bissecção
+            dx_ant, dx = dx, 0.5 * (hi - lo)
+            t = lo + dx
+        else:
+            dx_ant, dx = dx, f / df
+            t = t - dx
+        if abs(dx) < tol:
+            return t
+        f, df = func(t)
+        if f < 0: lo = t
+        else: hi = t
+    return t
+
+def resolver_estacao(id_corpo, a, b, flags=efe.FLAGS_PADRAO, tol=TOL_JD):
+    """Instante em que a velocidade troca de sinal entre a e b (bissecção)."""
+    va = swe.calc_ut(a, id_corpo, flags)[0][3]
+    while b - a > tol:
+        meio = 0.5 * (a + b)
+        vm = swe.calc_ut(meio, id_corpo, flags)[0][3]
+        if (vm < 0) == (va < 0):
+            a, va = meio, vm
+        else:
+            b = meio
+    return 0.5 * (a + b)
+
+def _funcao_offset(id_corpo, grau_natal, nivel, flags):
+    def func(jd):
+        res, _ = swe.calc_ut(jd, id_corpo, flags)
+        return offset_no_signo(res[0], grau_natal) - nivel, res[3]
+    return func
+
+def _ponto(jd, id_corpo, grau_natal, flags):
+    res, _ = swe.calc_ut(jd, id_corpo, flags)
+    return {"jd": jd, "long": res[0], "vel": res[3], "dist": abs(offset_no_signo(res[0], grau_natal))}
+
+def janelas_orbe(jds, longitudes, velocidades, id_corpo, grau_natal, orbe=efe.ORBE_PADRAO, flags=efe.FLAGS_PADRAO, tol=TOL_JD):
+    """Janelas em que o corpo fica dentro do orbe do grau natal, com instantes exatos.
+
+    Cada janela traz "entrada" e "saida" (JD; a borda da grade quando a janela é cortada pelo
+    período), "picos" (perfeições exatas e estações que se aproximam do grau sem tocá-lo) e
+    "maximo" (o ponto de maior intensidade da janela).
+    """
+    jds = np.asarray(jds, dtype=float)
+    longitudes = np.asarray(longitudes)
+    velocidades = np.asarray(velocidades)
+    off = offset_no_signo(longitudes, grau_natal)
+    dentro = np.abs(off) <= orbe
+    if not dentro.any():
+        return []
+
+    borda = np.diff(dentro.astype(np.int8))
+    inicios = list(np.flatnonzero(borda == 1) + 1)
+    fins = list(np.flatnonzero(borda == -1))
+    if dentro[0]: inicios.insert(0, 0)
+    if dentro[-1]: fins.append(len(jds) - 1)
+
+    janelas = []
+    for i0, i1 in zip(inicios, fins):
+        if i0 == 0:
+            entrada = jds[0]
+        else:
+            # A borda cruzada é a do lado da amostra de fora: a de dentro pode já estar do outro
+            # lado do grau (um passo que atravessa a faixa forte inteira)
+            nivel = np.copysign(orbe, off[i0 - 1])
+            entrada = resolver_raiz(_funcao_offset(id_corpo, grau_natal, nivel, flags), jds[i0 - 1], jds[i0], tol)
+        if i1 == len(jds) - 1:
+            saida = jds[-1]
+        else:
+            nivel = np.copysign(orbe, off[i1 + 1])
+            saida = resolver_raiz(_funcao_offset(id_corpo, grau_natal, nivel, flags), jds[i1], jds[i1 + 1], tol)
+
+        picos = []
+        # Mesma vizinhança da entrada e da saída: com o passo nativo, a faixa forte costuma ter
+        # uma única amostra, e a troca de sinal fica entre ela e a amostra de fora
+        lo, hi = max(i0 - 1, 0), min(i1 + 1, len(jds) - 1)
+        trecho = off[lo:hi + 1]
+        # Perfeições: troca de sinal do offset (sem a volta de +15° para -15°)
+        for k in np.flatnonzero(((trecho[:-1] < 0) != (trecho[1:] < 0)) & (np.abs(np.diff(trecho)) < 15)) + lo:
+            jd_pico = resolver_raiz(_funcao_offset(id_corpo, grau_natal, 0.0, flags), jds[k], jds[k + 1], tol)
+            if not entrada <= jd_pico <= saida or (picos and abs(jd_pico - picos[-1]["jd"]) < 10 * tol):
+                continue
+            picos.append(_ponto(jd_pico, id_corpo, grau_natal, flags))
+
+        # Estações: o corpo para perto do grau e volta sem tocá-lo (mínimo local da distância)
+        vel = velocidades[lo:hi + 1]
+        for k in np.flatnonzero((vel[:-1] < 0) != (vel[1:] < 0)) + lo:
+            ponto = _ponto(resolver_estacao(id_corpo, jds[k], jds[k + 1], flags, tol), id_corpo, grau_natal, flags)
+            perto_de_pico = any(abs(ponto["jd"] - p["jd"]) < 10 * tol for p in picos)
+            if entrada <= ponto["jd"] <= saida and ponto["dist"] <= min(abs(off[k]), abs(off[k + 1])) and not perto_de_pico:
+                picos.append(ponto)
+        picos.sort(key=lambda p: p["jd"])
+
+        if picos:
+            maximo = min(picos, key=lambda p: p["dist"])
+        else:
+            # Sem perfeição nem estação, a distância é monótona na janela (cortada pelo período):
+            # o máximo é uma das bordas, que já são instantes exatos
+            maximo = min((_ponto(entrada, id_corpo, grau_natal, flags), _ponto(saida, id_corpo, grau_natal, flags)), key=lambda p: p["dist"])
+
+        janelas.append({"entrada": entrada, "saida": saida, "picos": picos, "maximo": maximo})
+    return janelas
+
+# --- ESTAÇÕES E SOMBRAS ---
+def _diferenca_longitude(longitudes, alvo):
+    """Diferença com sinal (-180 a 180°) entre as longitudes e uma longitude alvo."""
+    return ((np.asarray(longitudes) - alvo + 180) % 360) - 180
+
+def _funcao_longitude(id_corpo, alvo, flags):
+    def func(jd):
+        res, _ = swe.calc_ut(jd, id_corpo, flags)
+        return _diferenca_longitude(res[0], alvo), res[3]
+    return func
+
+def _marchar(valor, t, direcao, passo=1.0, limite_dias=400):
+    """Anda a partir de t (fora da grade) até o valor trocar de sinal; devolve o intervalo (a, b)."""
+    v0 = valor(t)
+    for _ in range(int(limite_dias / passo)):
+        t_prox = t + direcao * passo
+        v1 = valor(t_prox)
+        if (v1 < 0) != (v0 < 0):
+            return min(t, t_prox), max(t, t_prox)
+        t, v0 = t_prox, v1
+    return None
+
+def _estacao_fora_da_grade(id_corpo, t, direcao, flags, tol):
+    intervalo = _marchar(lambda jd: swe.calc_ut(jd, id_corpo, flags)[0][3], t, direcao)
+    return resolver_estacao(id_corpo, *intervalo, flags, tol) if intervalo else None
+
+def _cruzamento(jds, longitudes, id_corpo, alvo, i_ini, direcao, flags, tol):
+    """Próxima passagem pela longitude alvo a partir do índice i_ini, na direção dada (+1 ou -1)."""
+    func = _funcao_longitude(id_corpo, alvo, flags)
+    d = _diferenca_longitude(longitudes, alvo)
+    idx = np.arange(i_ini, -1, -1) if direcao < 0 else np.arange(i_ini, len(jds))
+    troca = np.flatnonzero((d[idx] < 0) != (d[i_ini] < 0))
+    if len(troca):
+        k = idx[troca[0]]
+        return resolver_raiz(func, *sorted((jds[k - direcao], jds[k])), tol)
+    # A passagem cai fora do período amostrado: continua a partir da borda
+    intervalo = _marchar(lambda jd: func(jd)[0], jds[idx[-1]], direcao)
+    return resolver_raiz(func, *intervalo, tol) if intervalo else None
+
+def estacoes(jds, velocidades, id_corpo, flags=efe.FLAGS_PADRAO, tol=TOL_JD):
+    """Estações exatas: trocas de sinal da velocidade isoladas na grade e refinadas."""
+    vel = np.asarray(velocidades)
+    lista = []
+    for k in np.flatnonzero((vel[:-1] < 0) != (vel[1:] < 0)):
+        jd = resolver_estacao(id_corpo, jds[k], jds[k + 1], flags, tol)
+        lista.append({"jd": jd, "long": swe.calc_ut(jd, id_corpo, flags)[0][0], "tipo": "R" if vel[k + 1] < 0 else "D", "indice": int(k)})
+    return lista
+
+def ingressos(jds, longitudes, id_corpo, flags=efe.FLAGS_PADRAO, tol=TOL_JD):
+    """Entradas exatas em signo: trocas de signo isoladas na grade e refinadas na cúspide.
+
+    "direcao" é 1 quando o corpo avança para o signo seguinte e -1 quando volta (retrogradação).
+    """
+    signos = (np.asarray(longitudes) // 30).astype(int) % 12
+    lista = []
+    for k in np.flatnonzero(signos[:-1] != signos[1:]):
+        avanco = (signos[k + 1] - signos[k]) % 12 == 1
+        # Avançando, cruza a cúspide do novo signo; recuando, a do signo que deixa
+        cuspide = 30.0 * (signos[k + 1] if avanco else signos[k])
+        jd = resolver_raiz(_funcao_longitude(id_corpo, cuspide, flags), jds[k], jds[k + 1], tol)
+        lista.append({"jd": jd, "signo": int(signos[k + 1]), "direcao": 1 if avanco else -1})
+    return lista
+
+def movimento_anual(jds, longitudes, velocidades, id_corpo, flags=efe.FLAGS_PADRAO, tol=TOL_JD):
+    """Períodos Direto/Retrógrado com estações exatas e os limites das sombras de cada retrogradação.
+
+    Os períodos retrógrados trazem "estacao_r", "estacao_d", "sombra_ini" (o corpo passa pela
+    longitude da estação direta) e "sombra_fim" (volta à longitude da estação retrógrada); esses
+    instantes podem cair fora da grade quando a retrogradação atravessa a borda do período.
+    """
+    jds = np.asarray(jds, dtype=float)
+    longitudes = np.asarray(longitudes)
+    vel = np.asarray(velocidades)
+    lista_est = estacoes(jds, vel, id_corpo, flags, tol)
+
+    periodos = []
+    inicio, retro = jds[0], bool(vel[0] < 0)
+    for est in lista_est:
+        periodos.append({"inicio": inicio, "fim": est["jd"], "retrogrado": retro})
+        inicio, retro = est["jd"], est["tipo"] == "R"
+    periodos.append({"inicio": inicio, "fim": jds[-1], "retrogrado": retro})
+
+    for i, periodo in enumerate(periodos):
+        if not periodo["retrogrado"]:
+            continue
+        # Estações que delimitam a retrogradação (buscadas fora da grade quando necessário)
+        est_r = next((e for e in lista_est if e["jd"] == periodo["inicio"]), None)
+        est_d = next((e for e in lista_est if e["jd"] == periodo["fim"]), None)
+        jd_r = est_r["jd"] if est_r else _estacao_fora_da_grade(id_corpo, jds[0], -1, flags, tol)
+        jd_d = est_d["jd"] if est_d else _estacao_fora_da_grade(id_corpo, jds[-1], 1, flags, tol)
+        periodo["estacao_r"], periodo["estacao_d"] = jd_r, jd_d
+        periodo["sombra_ini"] = periodo["sombra_fim"] = None
+        if jd_r is None or jd_d is None:
+            continue
+        long_r = swe.calc_ut(jd_r, id_corpo, flags)[0][0]
+        long_d = swe.calc_ut(jd_d, id_corpo, flags)[0][0]
+        i_r = est_r["indice"] if est_r else 0
+        i_d = est_d["indice"] + 1 if est_d else len(jds) - 1
+        # Sombra pré-retrógrada: antes da estação R, quando o corpo passa pela longitude da estação D
+        periodo["sombra_ini"] = _cruzamento(jds, longitudes, id_corpo, long_d, i_r, -1, flags, tol)
+        # Sombra pós-retrógrada: depois da estação D, quando o corpo volta à longitude da estação R
+        periodo["sombra_fim"] = _cruzamento(jds, longitudes, id_corpo, long_r, i_d, 1, flags, tol)
+    return periodos
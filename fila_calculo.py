@@ -0,0 +1,314 @@
+import os
+import sys
+import queue
+import types
+import pickle
+import hashlib
+import threading
+import multiprocessing as mp
+from collections import OrderedDict, deque
+from concurrent.futures import Future, CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import cache_memoria as cm
+
+# --- FILA DE CÁLCULO FORA DO PROCESSO DO STREAMLIT ---
+# O Streamlit roda o script de cada sessão numa thread do mesmo processo: um cálculo longo
+# segura o GIL e atrasa as demais sessões. Aqui os trabalhos pesados vão para um pool de
+# processos compartilhado por todas as sessões; a thread da sessão só espera o resultado
+# (sem segurar o GIL). Pedidos idênticos em andamento são atendidos pelo mesmo trabalho e
+# o número de trabalhos pendentes é limitado (quem passa do limite espera a vez).
+#
+# As funções submetidas precisam ser importáveis pelos processos filhos (ex.: tarefas.py).
+# Os filhos nascem com um __main__ neutro: sob o `streamlit run`, o __main__ do servidor
+# aponta para o script do app, e o spawn o reexecutaria inteiro em cada processo novo.
+#
+# Antecipação: trabalhos prováveis (mês vizinho da Lua, ano seguinte) podem ser agendados em
+# segundo plano. Uma thread própria os submete um por vez (no máximo um processo do pool) e
+# os resultados ficam guardados, num orçamento em bytes, até que executar os peça.
+#
+# Progresso: executar(..., progresso=callback) entrega ao trabalho um chamável que manda cada
+# fração concluída por uma fila entre processos; a thread da sessão repassa ao callback
+# enquanto espera. O callback não entra na chave do pedido.
+#
+# Cancelamento: junto com o progresso, o trabalho recebe um evento entre processos. Se a
+# espera é interrompida (no Streamlit, o rerun sai da própria chamada ao callback) e ninguém
+# mais espera o mesmo pedido, o evento é marcado e o trabalho para no bloco seguinte
+# (efemerides.processar_em_blocos). Um pedido igual que chegue depois ganha um trabalho novo.
+#
+# Travas: nada aqui chama o pool (submit, shutdown) com a _trava adquirida, e nenhum callback
+# de Future submete trabalho. Os callbacks podem rodar na thread do pool com a trava interna
+# dele adquirida (pool quebrado), e um submit ali ou uma espera pela _trava travaria o servidor.
+
+PROCESSOS = int(os.environ.get("FILA_PROCESSOS", min(4, os.cpu_count() or 1)))
+MAX_PENDENTES = int(os.environ.get("FILA_MAX_PENDENTES", 32))
+MAX_ANTECIPADOS = int(os.environ.get("FILA_MAX_ANTECIPADOS", 32))
+ORCAMENTO_ANTECIPADOS = int(float(os.environ.get("FILA_ANTECIPADOS_MB", 256)) * 2**20)
+
+_trava = threading.Lock()
+_sinal = threading.Condition(_trava)
+_vagas = threading.BoundedSemaphore(MAX_PENDENTES)
+_estado = {"pool": None}
+_em_andamento = {}
+_antecipacao = {"pendentes": deque(maxlen=MAX_ANTECIPADOS), "ativo": None, "consumido": False, "thread": None, "bytes": 0}
+_antecipados = OrderedDict()
+# Por onde saiu cada resultado de executar: pool, antecipação guardada ou a própria thread (reserva)
+_contadores = {"no_pool": 0, "antecipados": 0, "na_thread": 0}
+
+_trava_main = threading.Lock()
+
+class _ProcessoSemMain(mp.get_context("spawn").Process):
+    def start(self):
+        # O spawn registra o __main__ atual (nome ou arquivo) para o filho importar antes de
+        # qualquer coisa; durante o start, um módulo vazio no lugar faz o filho não importar nada
+        with _trava_main:
+            principal = sys.modules["__main__"]
+            neutro = types.ModuleType("__main__")
+            neutro.__spec__ = None
+            sys.modules["__main__"] = neutro
+            try:
+                super().start()
+            finally:
+                sys.modules["__main__"] = principal
+
+class _ContextoSemMain(type(mp.get_context("spawn"))):
+    Process = _ProcessoSemMain
+
+_trava_canal = threading.Lock()
+_canal_estado = {"gerenciador": None}
+
+class _Aviso:
+    """O `progresso` que o trabalho recebe no processo filho: põe cada fração na fila do canal."""
+    def __init__(self, mensagens):
+        self.mensagens = mensagens
+
+    def __call__(self, fracao):
+        self.mensagens.put(fracao)
+
+def _canal():
+    # Fila de progresso e evento de cancelamento entre processos; o gerenciador nasce uma vez,
+    # também sem o __main__. (None, None) sem processos disponíveis: o trabalho roda sem eles
+    with _trava_canal:
+        try:
+            if _canal_estado["gerenciador"] is None:
+                _canal_estado["gerenciador"] = _ContextoSemMain().Manager()
+            return _canal_estado["gerenciador"].Queue(), _canal_estado["gerenciador"].Event()
+        except (OSError, EOFError, NotImplementedError):
+            _canal_estado["gerenciador"] = None
+            return None, None
+
+def _novo_futuro(cancelamento=None):
+    futuro = Future()
+    # Quantas threads esperam o trabalho, e o evento que o interrompe (só com canal)
+    futuro.interessados, futuro.cancelamento, futuro.abandonado = 0, cancelamento, False
+    return futuro
+
+def _esperar(futuro, mensagens, progresso):
+    # Espera o Future repassando ao callback (nesta thread) as frações que chegam pelo canal
+    with _trava:
+        futuro.interessados += 1
+    concluido = False
+    try:
+        if mensagens is not None:
+            while not futuro.done():
+                try:
+                    progresso(mensagens.get(timeout=0.1))
+                except queue.Empty:
+                    pass
+            # O filho põe cada fração antes de devolver: as que sobraram já estão na fila
+            while True:
+                try:
+                    progresso(mensagens.get_nowait())
+                except queue.Empty:
+                    break
+        concluido = True
+    finally:
+        with _trava:
+            futuro.interessados -= 1
+            # Espera interrompida e mais ninguém esperando: o trabalho pode parar
+            abandonar = not concluido and futuro.interessados == 0 and futuro.cancelamento is not None and not futuro.done()
+            if abandonar:
+                futuro.abandonado = True
+        if abandonar:
+            try:
+                futuro.cancelamento.set()
+            except (OSError, EOFError):
+                pass
+    return futuro.result()
+
+def _pool():
+    with _trava:
+        if _estado["pool"] is None:
+            # spawn: não copia as threads do servidor do Streamlit para os filhos
+            _estado["pool"] = ProcessPoolExecutor(max_workers=PROCESSOS, mp_context=_ContextoSemMain())
+        return _estado["pool"]
+
+def _descartar_pool():
+    with _trava:
+        pool, _estado["pool"] = _estado["pool"], None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _encadear(origem, destino):
+    # Repassa o desfecho do Future do pool para o Future entregue a quem pediu
+    def repassar(f):
+        if f.cancelled():
+            destino.cancel()
+        elif f.exception() is not None:
+            destino.set_exception(f.exception())
+        else:
+            destino.set_result(f.result())
+    origem.add_done_callback(repassar)
+
+def _submeter_no_pool(funcao, args, kwargs, futuro):
+    # Fora da _trava: o submit pega a trava interna do pool
+    try:
+        _encadear(_pool().submit(funcao, *args, **kwargs), futuro)
+    except Exception as erro:
+        futuro.set_exception(erro)
+
+def chave_pedido(funcao, args, kwargs):
+    """Identifica pedidos iguais: a mesma função com os mesmos argumentos."""
+    conteudo = pickle.dumps((funcao.__module__, funcao.__qualname__, args, sorted(kwargs.items())))
+    return hashlib.sha256(conteudo).hexdigest()
+
+def submeter(funcao, *args, **kwargs):
+    """Future do trabalho; se um pedido idêntico já está em andamento, devolve o mesmo Future."""
+    return _submeter(chave_pedido(funcao, args, kwargs), funcao, args, kwargs)
+
+def _aproveitavel(k):
+    # Chamada com _trava já adquirida: o trabalho em andamento para o mesmo pedido, se ele não
+    # foi abandonado (vai parar) nem acabou (está saindo de _em_andamento)
+    futuro = _em_andamento.get(k)
+    return futuro if futuro is not None and not futuro.abandonado and not futuro.done() else None
+
+def _submeter(k, funcao, args, kwargs, cancelamento=None):
+    with _trava:
+        if _aproveitavel(k):
+            return _em_andamento[k]
+    _vagas.acquire()
+    with _trava:
+        # Outro pedido igual pode ter entrado enquanto esperávamos a vaga
+        if _aproveitavel(k):
+            _vagas.release()
+            return _em_andamento[k]
+        # Reservado antes do submit: pedidos iguais que chegarem agora esperam este mesmo Future
+        futuro = _novo_futuro(cancelamento)
+        _em_andamento[k] = futuro
+
+    def concluir(_):
+        with _trava:
+            if _em_andamento.get(k) is futuro:
+                del _em_andamento[k]
+        _vagas.release()
+    futuro.add_done_callback(concluir)
+    _submeter_no_pool(funcao, args, kwargs, futuro)
+    return futuro
+
+def executar(funcao, *args, progresso=None, **kwargs):
+    """Roda o trabalho no pool e espera o resultado; sem pool disponível, roda na própria thread.
+
+    Com `progresso`, a função recebe também um `progresso` e o callback é chamado nesta thread
+    com cada fração que ela informar (nada chega se o pedido já estava em andamento); recebe
+    ainda um `cancelamento` (com is_set()), marcado se esta espera for interrompida sem
+    ninguém mais esperando o mesmo pedido.
+    """
+    k = chave_pedido(funcao, args, kwargs)
+    with _trava:
+        if k in _antecipados:
+            _contadores["antecipados"] += 1
+            resultado, n_bytes = _antecipados.pop(k)
+            _antecipacao["bytes"] -= n_bytes
+            return resultado
+        futuro = None
+        if _antecipacao["ativo"] == k:
+            # A antecipação deste mesmo pedido está rodando: esperamos por ela, e o resultado
+            # não precisa ser guardado depois
+            _antecipacao["consumido"] = True
+            futuro = _em_andamento[k]
+    try:
+        mensagens = None
+        if futuro is None:
+            mensagens, cancelamento = _canal() if progresso is not None else (None, None)
+            extras = {} if mensagens is None else {"progresso": _Aviso(mensagens), "cancelamento": cancelamento}
+            futuro = _submeter(k, funcao, args, dict(kwargs, **extras), cancelamento)
+        resultado = _esperar(futuro, mensagens, progresso)
+        with _trava:
+            _contadores["no_pool"] += 1
+        return resultado
+    except BrokenProcessPool:
+        # Um processo filho morreu (memória, sinal): recria o pool na próxima e resolve aqui
+        _descartar_pool()
+    except (CancelledError, OSError, NotImplementedError):
+        pass
+    with _trava:
+        _contadores["na_thread"] += 1
+    if progresso is not None:
+        kwargs = dict(kwargs, progresso=progresso)
+    return funcao(*args, **kwargs)
+
+def estatisticas():
+    """Quantos resultados de executar vieram do pool, de antecipações e da própria thread."""
+    with _trava:
+        return dict(_contadores)
+
+def antecipar(funcao, *args, **kwargs):
+    """Agenda o trabalho em segundo plano, sem bloquear; o resultado fica guardado para executar.
+
+    Pedidos já guardados, em andamento ou na espera são ignorados. A espera é limitada: os
+    pedidos mais antigos saem primeiro quando ela enche (a sessão já mudou de ideia).
+    """
+    k = chave_pedido(funcao, args, kwargs)
+    with _trava:
+        if k in _antecipados or k in _em_andamento or any(p[0] == k for p in _antecipacao["pendentes"]):
+            return
+        _antecipacao["pendentes"].append((k, funcao, args, kwargs))
+        if _antecipacao["thread"] is None:
+            _antecipacao["thread"] = threading.Thread(target=_antecipar_em_serie, name="fila-antecipacao", daemon=True)
+            _antecipacao["thread"].start()
+        _sinal.notify()
+
+def _guardar_antecipado(k, resultado):
+    # Chamada com _trava já adquirida; descarta os mais antigos ao passar do orçamento
+    n_bytes = cm.tamanho(resultado)
+    if n_bytes > ORCAMENTO_ANTECIPADOS:
+        return
+    _antecipados[k] = (resultado, n_bytes)
+    _antecipacao["bytes"] += n_bytes
+    while _antecipacao["bytes"] > ORCAMENTO_ANTECIPADOS:
+        _, (_, liberados) = _antecipados.popitem(last=False)
+        _antecipacao["bytes"] -= liberados
+
+def _antecipar_em_serie():
+    # Laço da thread de antecipação: um pedido por vez, submetido e esperado aqui mesmo
+    while True:
+        with _sinal:
+            while not _antecipacao["pendentes"]:
+                _sinal.wait()
+            k, funcao, args, kwargs = _antecipacao["pendentes"].popleft()
+            if k in _antecipados or k in _em_andamento:
+                continue
+            futuro = _novo_futuro()
+            _em_andamento[k] = futuro
+            _antecipacao["ativo"], _antecipacao["consumido"] = k, False
+
+        _submeter_no_pool(funcao, args, kwargs, futuro)
+        resultado, concluido, quebrado = None, False, False
+        try:
+            resultado, concluido = futuro.result(), True
+        except BrokenProcessPool:
+            quebrado = True
+        except Exception:
+            # Antecipar é só um atalho: o erro aparece de novo (e é tratado) no pedido de verdade
+            pass
+        if quebrado:
+            _descartar_pool()
+
+        with _trava:
+            if _em_andamento.get(k) is futuro:
+                del _em_andamento[k]
+            _antecipacao["ativo"] = None
+            if concluido and not _antecipacao["consumido"]:
+                _guardar_antecipado(k, resultado)
+            if quebrado:
+                # Pool quebrado: nada de emendar a próxima antecipação; fica para os pedidos de verdade
+                _antecipacao["pendentes"].clear()
@@ -1,9 +1,10 @@
+import os
 import swisseph as swe
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import numpy as np
-from datetime import datetime
+import efemerides as efe
+import eventos as ev
 
 # Silencia o aviso de downcasting do Pandas
 pd.set_option('future.no_silent_downcasting', True)
@@ -17,6 +18,12 @@ ASPECTOS = {
     90: ("Quadratura", "□"), 120: ("Trígono", "△"), 150: ("Quincúncio", "⚻"), 180: ("Oposição", "☍")
 }
 
+# Símbolo do aspecto (HTML) indexado pelo código de efe.codigo_aspecto (-1 = sem aspecto)
+SIMBOLOS_ASPECTO_HTML = [f"<span style='font-size: 18px;'><b>{ASPECTOS[k * 30][1]}</b></span>" for k in range(7)] + [""]
+
+# Intensidade mínima (0.98) de um pico, convertida em distância ao grau natal
+DIST_PICO = efe.distancia_para_intensidade(0.98)
+
 def get_signo(longitude):
     return SIGNOS[int(longitude / 30) % 12]
 
@@ -49,6 +56,8 @@ def generate_stacked_transit_charts():
     # 1. CONFIGURAÇÃO DE MÚLTIPLOS ALVOS
     # ==========================================
     ano = 2026
+    # Processos para o cálculo (1 = em série; o resultado é idêntico em qualquer caso)
+    processos = os.cpu_count() or 1
     # Lista de alvos natais para gerar os gráficos empilhados
     alvos_natais = [
         {"planeta": "Sol", "signo": "Virgem", "grau": "27.0"},
@@ -83,75 +92,53 @@ def generate_stacked_transit_charts():
         shared_xaxes=True
     )
 
-    jd_start = swe.julday(ano, 1, 1)
-    jd_end = swe.julday(ano + 1, 1, 1)
-    steps = np.arange(jd_start, jd_end, 0.05)
-    flags = swe.FLG_SWIEPH | swe.FLG_SPEED
+    steps = efe.grade_jd(ano)
+    datas = efe.datas_do_grid(steps)
+
+    # Posições em trânsito calculadas uma única vez e cruzadas com todos os alvos natais
+    pos = efe.calcular_posicoes_hermite(steps, [p["id"] for p in planetas_monitorados], processos=processos)
+    longs_natais = [(SIGNOS.index(alvo["signo"]) * 30) + dms_to_dec(alvo["grau"]) for alvo in alvos_natais]
+    matriz = efe.matriz_alvos(pos["long"], longs_natais)
+
+    # Janelas e picos exatos de todos os alvos x corpos, distribuídos entre os processos
+    tarefas = [(steps, pos["long"][:, j], pos["vel"][:, j], p["id"], longs_natais[idx_alvo] % 30)
+               for idx_alvo in range(len(alvos_natais)) for j, p in enumerate(planetas_monitorados)]
+    janelas_alvos = iter(efe.mapear(ev.janelas_orbe, tarefas, processos))
 
     # Loop principal para cada gráfico natal
     for idx_alvo, alvo in enumerate(alvos_natais):
-        grau_decimal = dms_to_dec(alvo["grau"])
-        idx_signo_natal = SIGNOS.index(alvo["signo"])
-        long_natal_absoluta = (idx_signo_natal * 30) + grau_decimal
-        
-        all_data = []
-        for jd in steps:
-            y, m, d, h = swe.revjul(jd)
-            dt = datetime(y, m, d, int(h), int((h%1)*60))
-            row = {'date': dt}
-            
-            for p in planetas_monitorados:
-                res, _ = swe.calc_ut(jd, p["id"], flags)
-                long_abs, velocidade = res[0], res[3]
-                status = "Retrógrado" if velocidade < 0 else "Direto"
-                mov_abrev = " (R)" if velocidade < 0 else " (D)"
-                
-                pos_no_signo = long_abs % 30
-                grau = int(pos_no_signo)
-                minutos = int((pos_no_signo % 1) * 60)
-
-                dist = abs(((pos_no_signo - grau_decimal + 15) % 30) - 15)
-                val = np.exp(-0.5 * (dist / 1.7)**2)
-                
-                intensidade_txt = "Forte" if dist <= 1.0 else "Médio" if dist <= 2.5 else "Fraco"
-                simbolo = obter_simbolo_aspecto(long_abs, long_natal_absoluta)
-                simbolo_html = f"<span style='font-size: 18px;'><b>{simbolo}</b></span>" if simbolo else ""
-                
-                row[p["nome"]] = val if dist <= 5.0 else None
-                row[f"{p['nome']}_long"] = long_abs
-                row[f"{p['nome']}_status"] = status
-                row[f"{p['nome']}_info"] = f"{get_signo(long_abs)}{mov_abrev} {grau:02d}°{minutos:02d}' - {intensidade_txt} {simbolo_html}"
-            
-            all_data.append(row)
-
-        df = pd.DataFrame(all_data).infer_objects(copy=False)
+        # Só as amostras dentro do orbe, no esquema compacto do motor
+        tabela = efe.tabela_transitos(matriz["intensidade"][:, :, idx_alvo], pos["long"], pos["retro"],
+                                      matriz["aspecto"][:, :, idx_alvo], [p["nome"] for p in planetas_monitorados])
 
         # Adicionar as trilhas ao respectivo subplot
-        for p in planetas_monitorados:
-            # Gráfico de Área (Intensidade)
-            fig.add_trace(go.Scatter(
-                x=df['date'], y=df[p['nome']],
-                mode='lines', name=p['nome'],
-                legendgroup=p['nome'],
-                showlegend=(idx_alvo == 0), # Mostra legenda apenas no primeiro subplot
-                line=dict(color=p['cor'], width=2.5),
-                fill='tozeroy',
-                fillcolor=hex_to_rgba(p['cor'], 0.15),
-                customdata=df[f"{p['nome']}_info"],
-                hovertemplate="<b>%{customdata}</b><extra></extra>",
-                connectgaps=False
-            ), row=idx_alvo+1, col=1)
-
-            # Cálculo de Picos (Datas no topo das curvas)
-            serie_p = df[p['nome']].fillna(0)
-            peak_mask = (serie_p > 0.98) & (serie_p > serie_p.shift(1)) & (serie_p > serie_p.shift(-1))
-            picos = df[peak_mask]
+        for j, p in enumerate(planetas_monitorados):
+            trechos = efe.trechos_hover(tabela[tabela["corpo"] == p['nome']], longs_natais[idx_alvo] % 30, SIGNOS, SIMBOLOS_ASPECTO_HTML)
+            # Gráfico de Área (Intensidade), um trace por trecho com signo, direção e aspecto constantes
+            for n, trecho in enumerate(trechos):
+                fig.add_trace(go.Scatter(
+                    x=datas[trecho["fatia"]], y=trecho["intensidade"],
+                    mode='lines', name=p['nome'],
+                    legendgroup=p['nome'],
+                    showlegend=(idx_alvo == 0 and n == 0), # Mostra legenda apenas no primeiro subplot
+                    line=dict(color=p['cor'], width=2.5),
+                    fill='tozeroy',
+                    fillcolor=hex_to_rgba(p['cor'], 0.15),
+                    customdata=trecho["customdata"],
+                    hovertemplate=trecho["hovertemplate"],
+                    connectgaps=False
+                ), row=idx_alvo+1, col=1)
+
+            # Cálculo de Picos (instantes exatos de perfeição no topo das curvas)
+            janelas = next(janelas_alvos)
+            picos = [pk for janela in janelas for pk in janela["picos"] if pk["dist"] < DIST_PICO]
             
-            if not picos.empty:
+            if picos:
+                datas_picos = [efe.jd_para_datetime(pk["jd"]) for pk in picos]
                 fig.add_trace(go.Scatter(
-                    x=picos['date'], y=picos[p['nome']] + 0.04,
+                    x=datas_picos, y=efe.intensidade([pk["dist"] for pk in picos]) + 0.04,
                     mode='markers+text',
-                    text=picos['date'].dt.strftime('%d/%m'),
+                    text=[d.strftime('%d/%m') for d in datas_picos],
                     textposition="top center",
                     textfont=dict(family="Arial", size=10, color="black"),
                     marker=dict(symbol="triangle-down", color=p['cor'], size=8),
@@ -1,8 +1,8 @@
 import swisseph as swe
 import pandas as pd
 import plotly.graph_objects as go
-import numpy as np
-from datetime import datetime
+import efemerides as efe
+import eventos as ev
 
 # Silencia o aviso de downcasting do Pandas
 pd.set_option('future.no_silent_downcasting', True)
@@ -22,6 +22,12 @@ ASPECTOS = {
     180: ("Oposição", "☍")
 }
 
+# Símbolo do aspecto (HTML) indexado pelo código de efe.codigo_aspecto (-1 = sem aspecto)
+SIMBOLOS_ASPECTO_HTML = [f"<span style='font-size: 18px;'><b>{ASPECTOS[k * 30][1]}</b></span>" for k in range(7)] + [""]
+
+# Intensidade mínima (0.98) de um pico, convertida em distância ao grau natal
+DIST_PICO = efe.distancia_para_intensidade(0.98)
+
 def get_signo(longitude):
     return SIGNOS[int(longitude / 30) % 12]
 
@@ -81,78 +87,38 @@ def generate_degree_transit_chart():
     # ==========================================
     # 2. PROCESSAMENTO DE DADOS
     # ==========================================
-    jd_start = swe.julday(ano, 1, 1)
-    jd_end = swe.julday(ano + 1, 1, 1)
-    steps = np.arange(jd_start, jd_end, 0.05)
+    steps = efe.grade_jd(ano)
+    pos = efe.calcular_posicoes_hermite(steps, [p["id"] for p in planetas_monitorados], flags)
     
-    all_data = []
-    for jd in steps:
-        y, m, d, h = swe.revjul(jd)
-        dt = datetime(y, m, d, int(h), int((h%1)*60))
-        row = {'date': dt}
-        
-        for p in planetas_monitorados:
-            res, _ = swe.calc_ut(jd, p["id"], flags)
-            long_abs, velocidade = res[0], res[3]
-            status = "Retrógrado" if velocidade < 0 else "Direto"
-            mov_abrev = " (R)" if velocidade < 0 else " (D)"
-            
-            pos_no_signo = long_abs % 30
-            grau = int(pos_no_signo)
-            minutos = int((pos_no_signo % 1) * 60)
-            
-            dist = abs(((pos_no_signo - grau_decimal + 15) % 30) - 15)
-            val = np.exp(-0.5 * (dist / 1.7)**2)
-            
-            if dist <= 1.0:
-                intensidade_txt = "Forte"
-            elif dist <= 2.5:
-                intensidade_txt = "Médio"
-            else:
-                intensidade_txt = "Fraco"
-
-            # Calcula o símbolo do aspecto
-            simbolo = obter_simbolo_aspecto(long_abs, long_natal_absoluta)
-
-            row[p["nome"]] = val if dist <= 5.0 else None
-            row[f"{p['nome']}_long"] = long_abs
-            row[f"{p['nome']}_status"] = status
-            
-            # --- MELHORIA DE VISIBILIDADE ---
-            # O símbolo agora é envolvido em HTML para aumentar tamanho e destaque
-            simbolo_html = f"<span style='font-size: 18px;'><b>{simbolo}</b></span>" if simbolo else ""
-            row[f"{p['nome']}_info"] = f"{get_signo(long_abs)}{mov_abrev} {grau:02d}°{minutos:02d}' - {intensidade_txt} {simbolo_html}"
-            
-        all_data.append(row)
-
-    df = pd.DataFrame(all_data).infer_objects(copy=False)
+    datas = efe.datas_do_grid(steps)
+    # Só as amostras dentro do orbe, no esquema compacto do motor (com o código do aspecto)
+    tabela = efe.tabela_transitos(efe.intensidade(efe.distancia_no_signo(pos["long"], grau_decimal)), pos["long"], pos["retro"],
+                                  efe.codigo_aspecto(pos["long"], long_natal_absoluta), [p["nome"] for p in planetas_monitorados])
+    print(f"Tabela de trânsitos: {len(tabela)} linhas, {efe.bytes_por_linha(tabela):.0f} bytes/linha")
+
     grau_limpo = str(grau_alvo_natal).replace('.', '_')
 
     # ==========================================
     # 3. GERAÇÃO DA TABELA EXCEL (ASPECTOS)
     # ==========================================
     eventos_aspectos = []
-    for p in planetas_monitorados:
+    janelas_por_corpo = {}
+    for j, p in enumerate(planetas_monitorados):
         nome = p["nome"]
-        serie_tabela = df[nome].fillna(0).values
-        for i in range(1, len(serie_tabela) - 1):
-            if serie_tabela[i] > 0.98 and serie_tabela[i] > serie_tabela[i-1] and serie_tabela[i] > serie_tabela[i+1]:
-                idx_ini = i
-                while idx_ini > 0 and serie_tabela[idx_ini] > 0.01: idx_ini -= 1
-                idx_fim = i
-                while idx_fim < len(serie_tabela) - 1 and serie_tabela[idx_fim] > 0.01: idx_fim += 1
-                
-                row_pico = df.iloc[i]
-                long_trans = row_pico[f"{nome}_long"]
+        # Entrada e saída do orbe e perfeições com instante exato
+        janelas_por_corpo[nome] = ev.janelas_orbe(steps, pos["long"][:, j], pos["vel"][:, j], p["id"], grau_decimal, flags=flags)
+        for janela in janelas_por_corpo[nome]:
+            for pico in janela["picos"]:
+                if pico["dist"] >= DIST_PICO: continue
                 eventos_aspectos.append({
-                    "Data e Hora Início": df.iloc[idx_ini]['date'].strftime('%d/%m/%Y %H:%M'),
-                    "Data e Hora Pico": row_pico['date'].strftime('%d/%m/%Y %H:%M'),
-                    "Data e Hora Término": df.iloc[idx_fim]['date'].strftime('%d/%m/%Y %H:%M'),
+                    "Data e Hora Início": efe.jd_para_datetime(janela["entrada"]).strftime('%d/%m/%Y %H:%M'),
+                    "Data e Hora Pico": efe.jd_para_datetime(pico["jd"]).strftime('%d/%m/%Y %H:%M'),
+                    "Data e Hora Término": efe.jd_para_datetime(janela["saida"]).strftime('%d/%m/%Y %H:%M'),
                     "Grau Natal": f"{grau_alvo_natal}°",
                     "Planeta e Signo Natal": f"{planeta_natal_ui} em {signo_natal_ui}",
-                    "Planeta e Signo em Trânsito": f"{nome.capitalize()} em {get_signo(long_trans)}",
-                    "Trânsito": row_pico[f"{nome}_status"],
-                    "Aspecto": calcular_aspecto(long_trans, long_natal_absoluta)
+                    "Planeta e Signo em Trânsito": f"{nome.capitalize()} em {get_signo(pico['long'])}",
+                    "Trânsito": "Retrógrado" if pico["vel"] < 0 else "Direto",
+                    "Aspecto": calcular_aspecto(pico["long"], long_natal_absoluta)
                 })
 
     if eventos_aspectos:
@@ -162,21 +128,17 @@ def generate_degree_transit_chart():
     # 3.1 MOVIMENTO ANUAL
     # ==========================================
     movimentos_anuais = []
-    for p in planetas_monitorados:
-        nome = p["nome"]
-        status_atual = df.iloc[0][f"{nome}_status"]
-        data_inicio = df.iloc[0]['date']
-        for i in range(1, len(df)):
-            status_ponto = df.iloc[i][f"{nome}_status"]
-            if status_ponto != status_atual or i == len(df) - 1:
-                movimentos_anuais.append({
-                    "Planeta": nome.capitalize(),
-                    "Início": data_inicio.strftime('%d/%m/%Y'),
-                    "Término": df.iloc[i]['date'].strftime('%d/%m/%Y'),
-                    "Trânsito": status_atual
-                })
-                status_atual = status_ponto
-                data_inicio = df.iloc[i]['date']
+    for j, p in enumerate(planetas_monitorados):
+        # Estações exatas e limites das sombras de cada retrogradação
+        for per in ev.movimento_anual(steps, pos["long"][:, j], pos["vel"][:, j], p["id"], flags):
+            movimentos_anuais.append({
+                "Planeta": p["nome"].capitalize(),
+                "Início": efe.formatar_jd(per["inicio"]),
+                "Término": efe.formatar_jd(per["fim"]),
+                "Trânsito": "Retrógrado" if per["retrogrado"] else "Direto",
+                "Início da Sombra": efe.formatar_jd(per.get("sombra_ini")),
+                "Fim da Sombra": efe.formatar_jd(per.get("sombra_fim"))
+            })
 
     df_mov = pd.DataFrame(movimentos_anuais)
     df_mov.to_excel(f"movimento_planetas_{ano}.xlsx", index=False)
@@ -186,26 +148,28 @@ def generate_degree_transit_chart():
     # ==========================================
     fig = go.Figure()
     for p in planetas_monitorados:
-        fig.add_trace(go.Scatter(
-            x=df['date'], y=df[p['nome']],
-            mode='lines', name=p['nome'],
-            legendgroup=p['nome'],
-            line=dict(color=p['cor'], width=2.5),
-            fill='tozeroy',
-            fillcolor=hex_to_rgba(p['cor'], 0.15),
-            customdata=df[f"{p['nome']}_info"],
-            hovertemplate="<b>%{customdata}</b><extra></extra>",
-            connectgaps=False 
-        ))
-
-        serie_p = df[p['nome']].fillna(0).infer_objects(copy=False)
-        peak_mask = (serie_p > 0.98) & (serie_p > serie_p.shift(1)) & (serie_p > serie_p.shift(-1))
-        picos = df[peak_mask]
-        if not picos.empty:
+        trechos = efe.trechos_hover(tabela[tabela["corpo"] == p['nome']], grau_decimal, SIGNOS, SIMBOLOS_ASPECTO_HTML)
+        # Um trace por trecho com signo, direção e aspecto constantes
+        for n, trecho in enumerate(trechos):
+            fig.add_trace(go.Scatter(
+                x=datas[trecho["fatia"]], y=trecho["intensidade"],
+                mode='lines', name=p['nome'],
+                legendgroup=p['nome'], showlegend=(n == 0),
+                line=dict(color=p['cor'], width=2.5),
+                fill='tozeroy',
+                fillcolor=hex_to_rgba(p['cor'], 0.15),
+                customdata=trecho["customdata"],
+                hovertemplate=trecho["hovertemplate"],
+                connectgaps=False
+            ))
+
+        picos = [pk for janela in janelas_por_corpo[p['nome']] for pk in janela["picos"] if pk["dist"] < DIST_PICO]
+        if picos:
+            datas_picos = [efe.jd_para_datetime(pk["jd"]) for pk in picos]
             fig.add_trace(go.Scatter(
-                x=picos['date'], y=picos[p['nome']] + 0.04,
+                x=datas_picos, y=efe.intensidade([pk["dist"] for pk in picos]) + 0.04,
                 mode='markers+text',
-                text=picos['date'].dt.strftime('%d/%m'),
+                text=[d.strftime('%d/%m') for d in datas_picos],
                 textposition="top center",
                 textfont=dict(family="Arial Black", size=10, color="#CCCCCC"),
                 marker=dict(symbol="triangle-down", color=p['cor'], size=8),
@@ -0,0 +1,153 @@
+import os
+import numpy as np
+import swisseph as swe
+import efemerides as efe
+import eventos as ev
+import coeficientes as coef
+import construir_almanaque as alm
+
+# --- TRABALHOS PESADOS DOS APPS ---
+# Funções importáveis pelos processos da fila de cálculo (fila_calculo): recebem e devolvem
+# só dados simples (números, listas, dicts, arrays e DataFrames), nada do Streamlit.
+
+# --- ALMANAQUE PRÉ-CALCULADO ---
+# As séries do ano (e os meses, recortados delas) saem dos .npz do construir_almanaque quando o manifesto é da versão
+# atual do swisseph e tem o ano e os corpos; cada arquivo tem o sha256 conferido uma vez por
+# processo (e de novo se mudar no disco). Corpos fora do almanaque são calculados normalmente.
+ALMANAQUE = alm.DIRETORIO_PADRAO
+_conferidos = {}
+
+def _arquivo_confere(caminho, checksum):
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return False
+    marca = (checksum, estado.st_mtime_ns, estado.st_size)
+    if _conferidos.get(caminho) != marca:
+        if alm.sha256_arquivo(caminho) != checksum:
+            return False
+        _conferidos[caminho] = marca
+    return True
+
+def series_almanaque(ano, ids_corpos, diretorio=None):
+    """Séries do ano (como as de series_periodo) dos corpos que o almanaque tem; {} sem almanaque."""
+    diretorio = ALMANAQUE if diretorio is None else diretorio
+    manifesto = alm.carregar_manifesto(diretorio)
+    if manifesto.get("_versao_swe") != swe.version:
+        return {}
+    series = {}
+    for arquivo, checksum in manifesto.items():
+        tarefa = alm.ler_nome_tarefa(arquivo)
+        if tarefa is None or tarefa[0] != ano:
+            continue
+        faltantes = [i for i in tarefa[1] if i in ids_corpos and i not in series]
+        caminho = os.path.join(diretorio, arquivo)
+        if not faltantes or not _arquivo_confere(caminho, checksum):
+            continue
+        with np.load(caminho, allow_pickle=False) as dados:
+            for id_corpo in faltantes:
+                # Arquivos de versões antigas do construtor não têm passo e erro: ficam para o cálculo
+                if f"passo_{id_corpo}" not in dados.files:
+                    continue
+                jd, longs, vel = dados[f"posicoes_{id_corpo}"]
+                series[id_corpo] = {"jd": jd, "long": longs, "vel": vel,
+                                    "passo": float(dados[f"passo_{id_corpo}"]), "erro": float(dados[f"erro_{id_corpo}"])}
+    return series
+
+def recortar_serie(serie, jd_ini, jd_fim):
+    """Trecho da série que cobre [jd_ini, jd_fim], com as amostras vizinhas de cada lado."""
+    i = max(int(np.searchsorted(serie["jd"], jd_ini, side="right")) - 1, 0)
+    j = min(int(np.searchsorted(serie["jd"], jd_fim, side="left")) + 1, len(serie["jd"]))
+    trecho = {campo: serie[campo][i:j] for campo in ("jd", "long", "vel")}
+    trecho["passo"] = float(np.max(np.diff(trecho["jd"]))) if j - i > 1 else serie["passo"]
+    if "erro" in serie:
+        trecho["erro"] = serie["erro"]
+    return trecho
+
+def series_periodo(ano, mes, ids_corpos, progresso=None, cancelamento=None):
+    """Série de cada corpo no seu passo nativo (ano inteiro ou um único mês), montada mês a mês.
+
+    O que estiver no almanaque pré-calculado é lido em vez de calculado (o mês avulso é um
+    recorte da série do ano: os blocos mensais emendam nas mesmas amostras).
+    """
+    series = series_almanaque(ano, ids_corpos)
+    if mes is not None:
+        series = {i: recortar_serie(serie, *efe.limites_periodo(ano, mes)) for i, serie in series.items()}
+    faltantes = [i for i in ids_corpos if i not in series]
+    if faltantes:
+        series.update(efe.calcular_series_em_blocos(efe.blocos_periodo(ano, mes), faltantes, verificar=True, fonte=coef.calcular_posicoes,
+                                                     cancelamento=cancelamento, progresso=progresso))
+    elif progresso is not None:
+        progresso(1.0)
+    return {i: series[i] for i in ids_corpos}
+
+def series_previa(ano, mes, ids_corpos):
+    """Séries grossas (RESOLUCAO_PREVIA) do período num trabalho só, para a prévia antes das séries finas."""
+    return efe.calcular_series(*efe.limites_periodo(ano, mes), ids_corpos, resolucao=efe.RESOLUCAO_PREVIA, fonte=coef.calcular_posicoes)
+
+def _faixa(progresso, ini, fim):
+    """Repassa a fração de uma etapa como a fração [ini, fim] do trabalho todo."""
+    return None if progresso is None else (lambda fracao: progresso(ini + (fim - ini) * fracao))
+
+def _tarefas_janelas(series, corpos, graus_natais, orbe_forte):
+    return [
+        (series[p["id"]]["jd"], series[p["id"]]["long"], series[p["id"]]["vel"], p["id"], grau, orbe)
+        for grau in graus_natais for p in corpos for orbe in (efe.ORBE_PADRAO, orbe_forte)
+    ]
+
+def eventos_corpos(ano, mes, corpos, grau_natal, orbe_forte):
+    """Janelas de orbe e de intensidade forte (entrada, saída e picos exatos) de cada corpo."""
+    series = series_periodo(ano, mes, [p["id"] for p in corpos])
+    janelas = iter(efe.mapear(ev.janelas_orbe, _tarefas_janelas(series, corpos, [grau_natal], orbe_forte)))
+    return {p["nome"]: {"transito": next(janelas), "forte": next(janelas)} for p in corpos}
+
+def movimentos_anuais(ano, corpos):
+    """Períodos Direto/Retrógrado do ano, com estações e sombras, por corpo."""
+    series = series_periodo(ano, None, [p["id"] for p in corpos])
+    return {p["nome"]: ev.movimento_anual(series[p["id"]]["jd"], series[p["id"]]["long"], series[p["id"]]["vel"], p["id"]) for p in corpos}
+
+def _tabelas_alvos(series, ano, mes, passo, longs_natais, nomes_alvos, corpos, progresso=None, cancelamento=None):
+    steps = efe.grade_jd(ano, mes, passo)
+    ids, nomes_corpos = [p["id"] for p in corpos], [p["nome"] for p in corpos]
+    # A grade do período inteiro, cortada no início de cada mês: um trecho por bloco, com
+    # progresso entre eles e sem o array [tempo x corpo x alvo] do ano todo na memória
+    cortes = [0] + [int(i) for i in np.searchsorted(steps, [ini for ini, _ in efe.blocos_periodo(ano, mes)[1:]])] + [len(steps)]
+
+    def trecho(ini, fim):
+        # Posições em trânsito calculadas uma única vez para todos os alvos natais
+        pos = efe.reamostrar(series, ids, steps[ini:fim])
+        # Cálculo de distância considerando a volta do zodíaco (orb de 5 graus), [tempo x corpo x alvo]
+        matriz = efe.matriz_alvos(pos["long"], longs_natais)
+        # Só as amostras dentro do orbe (intensidade exponencial), no esquema compacto do motor
+        return [efe.tabela_transitos(matriz["intensidade"][:, :, k], pos["long"], pos["retro"], matriz["aspecto"][:, :, k], nomes_corpos, ini)
+                for k in range(len(nomes_alvos))]
+
+    partes = efe.processar_em_blocos(trecho, list(zip(cortes[:-1], cortes[1:])), cancelamento, progresso)
+    tabelas = {nome: efe.juntar_tabelas([parte[k] for parte in partes]) for k, nome in enumerate(nomes_alvos)}
+    return {"date": efe.datas_do_grid(steps), "tabelas": tabelas}
+
+def tabelas_previa(ano, mes, passo, longs_natais, nomes_alvos, corpos):
+    """Tabelas de trânsitos dos alvos natais a partir das séries grossas, sem os eventos (a prévia)."""
+    series = series_previa(ano, mes, [p["id"] for p in corpos])
+    return _tabelas_alvos(series, ano, mes, passo, longs_natais, nomes_alvos, corpos)
+
+def transitos_alvos(ano, mes, passo, longs_natais, nomes_alvos, corpos, orbe_forte, progresso=None, cancelamento=None):
+    """Tabelas de trânsitos e eventos de todos os alvos natais de uma vez.
+
+    `progresso`, se informado, recebe a fração concluída (0 a 1) a cada mês das séries e das
+    tabelas e a cada alvo dos eventos; com `cancelamento` marcado, para no bloco seguinte
+    (efe.CalculoCancelado).
+    """
+    series = series_periodo(ano, mes, [p["id"] for p in corpos], _faixa(progresso, 0.0, 0.4), cancelamento)
+    resultados = _tabelas_alvos(series, ano, mes, passo, longs_natais, nomes_alvos, corpos, _faixa(progresso, 0.4, 0.8), cancelamento)
+
+    # Entrada, saída e picos exatos (orbe de 5° e faixa de intensidade forte), na série nativa,
+    # alvo a alvo, para cada corpo; em paralelo quando EFEMERIDES_PROCESSOS > 1
+    por_alvo = efe.processar_em_blocos(
+        lambda grau: efe.mapear(ev.janelas_orbe, _tarefas_janelas(series, corpos, [grau], orbe_forte)),
+        [(l % 30,) for l in longs_natais], cancelamento, _faixa(progresso, 0.8, 1.0))
+    eventos = {}
+    for nome, janelas in zip(nomes_alvos, por_alvo):
+        janelas = iter(janelas)
+        eventos[nome] = {p["nome"]: {"transito": next(janelas), "forte": next(janelas)} for p in corpos}
+    return resultados, eventos
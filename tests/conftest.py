@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+# Os módulos do projeto ficam na raiz do repositório (apps e motor lado a lado)
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Cache em disco num diretório temporário, herdado também pelos processos filhos
+os.environ.setdefault("EFEMERIDES_CACHE", tempfile.mkdtemp(prefix="cache_efemerides_"))
+# Almanaque pré-calculado vazio: cada teste grava só os anos de que precisa
+os.environ.setdefault("EFEMERIDES_ALMANAQUE", tempfile.mkdtemp(prefix="almanaque_"))
+
+def arquivo_main():
+    """Arquivo do __main__ do processo (roda nos filhos da fila: deve ser None, nunca o app)."""
+    return getattr(sys.modules["__main__"], "__file__", None)
+
+def morrer():
+    """Derruba o processo filho que rodar o trabalho (quebra o pool)."""
+    import multiprocessing as mp
+    if mp.parent_process() is not None:
+        os._exit(1)
+
+def dormir(segundos, valor):
+    import time
+    time.sleep(segundos)
+    return valor
+
+def bytes_de(n, marca):
+    return bytes([marca]) * n
+
+def etapas(n, progresso=None, cancelamento=None):
+    """Informa o progresso a cada uma das n etapas e devolve o pid de quem rodou."""
+    for i in range(n):
+        if progresso is not None:
+            progresso((i + 1) / n)
+    return os.getpid()
+
+def blocos_marcados(arquivo, n, segundos, progresso=None, cancelamento=None):
+    """n blocos de `segundos` cada, com uma linha no arquivo por bloco concluído."""
+    import time
+    import efemerides as efe
+    def bloco(i):
+        time.sleep(segundos)
+        with open(arquivo, "a") as f:
+            f.write(f"{i}\n")
+    efe.processar_em_blocos(bloco, [(i,) for i in range(n)], cancelamento, progresso)
+    return n
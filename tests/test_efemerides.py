@@ -0,0 +1,40 @@
+import numpy as np
+import swisseph as swe
+
+import efemerides as efe
+
+def fonte_deslocada(jds, ids_corpos, flags=efe.FLAGS_PADRAO):
+    """calcular_posicoes com 0,01° a mais em todas as longitudes (uma fonte imprecisa)."""
+    pos = efe.calcular_posicoes(jds, ids_corpos, flags)
+    pos["long"] = (pos["long"] + 0.01) % 360
+    return pos
+
+def test_erro_e_conferido_contra_o_swisseph_e_nao_contra_a_fonte():
+    jd_ini, jd_fim = efe.limites_periodo(2026, 3)
+    serie = efe.calcular_series(jd_ini, jd_fim, [swe.MARS], verificar=True, fonte=fonte_deslocada, em_disco=False)[swe.MARS]
+    assert serie["erro"] >= 0.01
+
+def test_erro_cobre_o_desvio_real_entre_as_amostras():
+    jd_ini, jd_fim = efe.limites_periodo(2026)
+    for id_corpo in (swe.MOON, swe.MERCURY, swe.JUPITER):
+        serie = efe.calcular_series(jd_ini, jd_fim, [id_corpo], verificar=True, em_disco=False)[id_corpo]
+        jds = np.linspace(jd_ini, jd_fim, 40 * len(serie["jd"]))
+        interp, _ = efe.interpolar_hermite(serie["jd"], serie["long"], serie["vel"], jds)
+        real = np.max(np.abs(((interp - efe.calcular_posicoes(jds, [id_corpo])["long"][:, 0] + 180) % 360) - 180))
+        assert serie["erro"] >= 0.95 * real
+
+def test_conferencia_dos_pedidos_e_esparsa(monkeypatch):
+    conferidos = []
+    calcular_posicoes = efe.calcular_posicoes
+    def contar(jds, ids_corpos, flags=efe.FLAGS_PADRAO):
+        conferidos.append(len(jds))
+        return calcular_posicoes(jds, ids_corpos, flags)
+    monkeypatch.setattr(efe, "calcular_posicoes", contar)
+
+    jd_ini, jd_fim = efe.limites_periodo(2026, 5)
+    fonte = lambda jds, ids_corpos, flags: calcular_posicoes(jds, ids_corpos, flags)
+    esparsa = efe.calcular_series(jd_ini, jd_fim, [swe.MOON], verificar=True, fonte=fonte, em_disco=False)[swe.MOON]
+    assert conferidos == [efe.INTERVALOS_VERIFICADOS * len(efe.FRACOES_VERIFICACAO)]
+    completa = efe.calcular_series(jd_ini, jd_fim, [swe.MOON], verificar="completa", fonte=fonte, em_disco=False)[swe.MOON]
+    # Os intervalos escolhidos são os de maior erro
+    assert esparsa["erro"] >= 0.95 * completa["erro"]
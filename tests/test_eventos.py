@@ -0,0 +1,21 @@
+import swisseph as swe
+
+import efemerides as efe
+import eventos as ev
+import tarefas
+
+def test_janela_forte_do_sol_tem_pico_exato():
+    # No passo nativo do Sol (~2 dias), a faixa forte (±1°) tem uma amostra só, às vezes já do
+    # outro lado do grau: o pico e as bordas têm de sair do solucionador, não da grade
+    orbe_forte = efe.distancia_para_intensidade(0.841)
+    serie = tarefas.series_periodo(2026, None, [swe.SUN])[swe.SUN]
+    janelas = ev.janelas_orbe(serie["jd"], serie["long"], serie["vel"], swe.SUN, 27.0, orbe_forte)
+    assert janelas
+    for janela in janelas:
+        assert janela["picos"]
+        for pico in janela["picos"]:
+            assert janela["entrada"] <= pico["jd"] <= janela["saida"]
+            assert pico["dist"] < 1e-4
+        for borda in (janela["entrada"], janela["saida"]):
+            if serie["jd"][0] < borda < serie["jd"][-1]:
+                assert abs(abs(ev.offset_no_signo(swe.calc_ut(borda, swe.SUN, efe.FLAGS_PADRAO)[0][0], 27.0)) - orbe_forte) < 1e-4
@@ -0,0 +1,92 @@
+import os
+import time
+import threading
+import multiprocessing as mp
+import pytest
+
+from conftest import RAIZ, arquivo_main, morrer, dormir, bytes_de, etapas, blocos_marcados
+import fila_calculo as fila
+
+def esperar_antecipacoes(limite=60):
+    fim = time.time() + limite
+    while time.time() < fim:
+        with fila._trava:
+            if fila._antecipacao["ativo"] is None and not fila._antecipacao["pendentes"]:
+                return
+        time.sleep(0.05)
+    raise AssertionError("antecipações não terminaram")
+
+def test_app_roda_os_trabalhos_em_processo_filho():
+    # Sob o Streamlit, o __main__ do processo é o script do app: os filhos do spawn não podem
+    # reexecutá-lo (app.py chama a fila já no carregamento, o que quebraria o pool)
+    AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+    app = os.path.join(RAIZ, "app_todos_planetas_ano.py")
+    antes = fila.estatisticas()
+    at = AppTest.from_file(app, default_timeout=600).run()
+    at.sidebar.button[0].click().run()
+    assert not at.exception
+
+    depois = fila.estatisticas()
+    assert depois["no_pool"] > antes["no_pool"]
+    assert depois["na_thread"] == antes["na_thread"]
+
+    # Os processos criados durante a execução do app não importaram o script
+    futuros = [fila.submeter(arquivo_main) for _ in range(fila.PROCESSOS)]
+    assert all(f.result() != app for f in futuros)
+    pid_filho = fila.executar(os.getpid)
+    assert pid_filho != os.getpid()
+    assert pid_filho in {p.pid for p in mp.active_children()}
+
+def test_pool_quebrado_durante_antecipacao_nao_trava_a_fila():
+    fila.antecipar(morrer)
+    fila.antecipar(dormir, 0.1, "depois da quebra")
+    esperar_antecipacoes()
+
+    resultado = {}
+    t = threading.Thread(target=lambda: resultado.update(pid=fila.executar(os.getpid)), daemon=True)
+    t.start()
+    t.join(60)
+    assert not t.is_alive(), "executar travou depois da quebra do pool"
+    assert resultado["pid"] != os.getpid()
+
+def test_antecipacao_consumida_nao_fica_guardada():
+    fila.antecipar(dormir, 1.0, "consumido")
+    time.sleep(0.2)
+    assert fila.executar(dormir, 1.0, "consumido") == "consumido"
+    esperar_antecipacoes()
+    assert fila.chave_pedido(dormir, (1.0, "consumido"), {}) not in fila._antecipados
+
+def test_antecipados_respeitam_o_orcamento_em_bytes(monkeypatch):
+    monkeypatch.setattr(fila, "ORCAMENTO_ANTECIPADOS", 25_000)
+    for marca in range(5):
+        fila.antecipar(bytes_de, 10_000, marca)
+        esperar_antecipacoes()
+    assert fila._antecipacao["bytes"] <= 25_000
+    assert sum(n for _, n in fila._antecipados.values()) == fila._antecipacao["bytes"]
+    # Os mais recentes ficam; os mais antigos saíram
+    assert fila.executar(bytes_de, 10_000, 4) == bytes([4]) * 10_000
+    assert fila.chave_pedido(bytes_de, (10_000, 0), {}) not in fila._antecipados
+
+def test_progresso_do_trabalho_chega_a_thread_que_espera():
+    fracoes = []
+    pid = fila.executar(etapas, 4, progresso=fracoes.append)
+    assert pid != os.getpid()
+    assert fracoes == [0.25, 0.5, 0.75, 1.0]
+
+class Desistencia(Exception):
+    """Faz o papel do rerun do Streamlit, que sai da chamada ao callback de progresso."""
+
+def test_espera_interrompida_para_o_trabalho(tmp_path):
+    arquivo = str(tmp_path / "blocos")
+    def desistir(fracao):
+        raise Desistencia()
+    with pytest.raises(Desistencia):
+        fila.executar(blocos_marcados, arquivo, 20, 0.1, progresso=desistir)
+    time.sleep(2.5)
+    with open(arquivo) as f:
+        assert len(f.readlines()) <= 3
+
+    # O mesmo pedido depois ganha um trabalho novo, que vai até o fim
+    assert fila.executar(blocos_marcados, arquivo, 20, 0.1, progresso=lambda fracao: None) == 20
+    with open(arquivo) as f:
+        assert len(f.readlines()) > 20
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pytest
+import swisseph as swe
+
+from conftest import RAIZ
+import construir_almanaque as alm
+import efemerides as efe
+import tarefas
+
+def gravar_almanaque(ano, longitude, grupos=(alm.CORPOS[:5], alm.CORPOS[5:])):
+    """Almanaque do ano com os corpos dos grupos parados em `longitude`, no formato do construtor."""
+    manifesto = alm.carregar_manifesto(alm.DIRETORIO_PADRAO) or {"_versao_swe": swe.version}
+    jds = np.linspace(*efe.limites_periodo(ano), 366)
+    for grupo in grupos:
+        tabelas = {"ids": np.array(grupo)}
+        for id_corpo in grupo:
+            tabelas[f"posicoes_{id_corpo}"] = np.vstack([jds, np.full_like(jds, longitude), np.zeros_like(jds)])
+            tabelas[f"passo_{id_corpo}"] = np.array(1.0)
+            tabelas[f"erro_{id_corpo}"] = np.array(0.0)
+        arquivo = alm.nome_tarefa(ano, grupo)
+        caminho = os.path.join(alm.DIRETORIO_PADRAO, arquivo)
+        alm.gravar_atomico(caminho, lambda f: np.savez(f, **tabelas))
+        manifesto[arquivo] = alm.sha256_arquivo(caminho)
+    alm.gravar_manifesto(alm.DIRETORIO_PADRAO, manifesto)
+
+def test_series_do_ano_vem_do_almanaque_e_o_resto_e_calculado():
+    gravar_almanaque(2031, 123.0, [alm.CORPOS[:5]])
+    series = tarefas.series_periodo(2031, None, [swe.JUPITER, swe.SUN])
+    assert list(series) == [swe.JUPITER, swe.SUN]
+    assert np.all(series[swe.SUN]["long"] == 123.0)
+    # Fora do almanaque: cálculo normal
+    assert np.ptp(series[swe.JUPITER]["long"]) > 0
+    # O mês avulso é recortado da série do ano, cobrindo o mês inteiro
+    jd_ini, jd_fim = efe.limites_periodo(2031, 3)
+    mes = tarefas.series_periodo(2031, 3, [swe.SUN, swe.JUPITER])
+    assert np.all(mes[swe.SUN]["long"] == 123.0)
+    assert mes[swe.SUN]["jd"][0] <= jd_ini and mes[swe.SUN]["jd"][-1] >= jd_fim
+    assert len(mes[swe.SUN]["jd"]) < len(series[swe.SUN]["jd"])
+    assert np.ptp(mes[swe.JUPITER]["long"]) > 0
+
+def test_mes_recortado_e_o_bloco_mensal_calculado():
+    series = tarefas.series_periodo(2033, None, [swe.MOON, swe.MARS])
+    for mes in (1, 6, 12):
+        calculado = efe.calcular_series_em_blocos(efe.blocos_periodo(2033, mes), [swe.MOON, swe.MARS])
+        for id_corpo, serie in calculado.items():
+            recorte = tarefas.recortar_serie(series[id_corpo], *efe.limites_periodo(2033, mes))
+            for campo in ("jd", "long", "vel"):
+                np.testing.assert_array_equal(recorte[campo], serie[campo])
+
+def test_almanaque_alterado_no_disco_e_ignorado():
+    gravar_almanaque(2032, 123.0)
+    caminho = os.path.join(alm.DIRETORIO_PADRAO, alm.nome_tarefa(2032, alm.CORPOS[:5]))
+    with open(caminho, "ab") as f:
+        f.write(b"\0")
+    assert swe.SUN not in tarefas.series_almanaque(2032, [swe.SUN])
+
+def test_app_usa_o_almanaque():
+    # Longitudes NaN no almanaque: nenhum corpo entra no orbe de nenhum alvo. Calculado de
+    # verdade, o Sol passa por todos os graus do signo ao longo do ano
+    AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+    gravar_almanaque(2027, np.nan)
+    at = AppTest.from_file(os.path.join(RAIZ, "app_todos_planetas_ano.py"), default_timeout=600).run()
+    at.sidebar.number_input[0].set_value(2027).run()
+    at.sidebar.button[0].click().run()
+    assert not at.exception
+
+    eventos = at.session_state["resultados_data"]
+    assert eventos
+    assert all(janelas == [] for por_corpo in eventos.values() for tipos in por_corpo.values() for janelas in tipos.values())
+
+def test_previa_nao_espera_as_series_finas(monkeypatch):
+    def series_finas(*args, **kwargs):
+        raise AssertionError("a prévia pediu as séries mês a mês")
+    monkeypatch.setattr(tarefas, "series_periodo", series_finas)
+    corpos = [{"id": swe.SUN, "nome": "SOL"}, {"id": swe.MARS, "nome": "MARTE"}]
+    previa = tarefas.tabelas_previa(2026, None, efe.passo_grafico(previa=True), [157.0], ["Sol"], corpos)
+    assert len(previa["date"]) == len(efe.grade_jd(2026, None, efe.passo_grafico(previa=True)))
+    assert len(previa["tabelas"]["Sol"])